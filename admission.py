@@ -0,0 +1,259 @@
+"""
+Admission control for the API routes.
+
+Requests are classed as interactive (map clicks), bulk (batch jobs,
+scenario sweeps) or background (scheduled refreshes). A fixed number run at
+once per process; the rest wait in a bounded queue per class and are
+admitted highest class first, oldest first. A request whose class queue is
+full is turned away immediately with 429, and one that waits past its
+class's max wait gets 503, both with a Retry-After estimate.
+
+Calls to upstream providers draw from a token bucket per provider. Lower
+classes may not drain a bucket below its reserve, so interactive requests
+keep some quota even while a batch job is running.
+
+Queue depth, wait times and upstream throttling are exported at /metrics in
+the Prometheus text format (per process).
+"""
+import hmac
+import math
+import threading
+import time
+from collections import deque
+
+import requests
+from flask import Response, g, has_request_context, request
+
+from config import ADMISSION_CONFIG
+from deadlines import LatencyTracker
+
+CLASSES = ('interactive', 'bulk', 'background')
+
+
+class UpstreamThrottled(requests.exceptions.RequestException):
+    """An upstream's token bucket is empty; existing upstream error handling applies"""
+
+    def __init__(self, upstream, retry_after):
+        super().__init__(f"{upstream} request budget exhausted, retry in {retry_after:.0f}s")
+        self.upstream = upstream
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """Refills at `rate` tokens per second up to `burst`"""
+
+    def __init__(self, rate, burst, reserve=0.0):
+        self.rate = rate
+        self.burst = burst
+        self.reserve = reserve * burst
+        self.tokens = float(burst)
+        self.throttled = 0
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def take(self, priority='interactive'):
+        """Take one token; returns 0 on success, else seconds until one is available"""
+        floor = 0.0 if priority == 'interactive' else self.reserve
+        with self._lock:
+            self._refill()
+            if self.tokens - 1 >= floor:
+                self.tokens -= 1
+                return 0.0
+            self.throttled += 1
+            return (floor + 1 - self.tokens) / self.rate
+
+    def available(self):
+        with self._lock:
+            self._refill()
+            return self.tokens
+
+
+class AdmissionController:
+    """Bounded per-class queues in front of a fixed number of running slots"""
+
+    def __init__(self, max_active=ADMISSION_CONFIG['max_active'],
+                 queue_limits=ADMISSION_CONFIG['queue_limits'],
+                 max_wait=ADMISSION_CONFIG['max_wait']):
+        self.max_active = max_active
+        self.queue_limits = queue_limits
+        self.max_wait = max_wait
+        self.active = 0
+        self._queues = {name: deque() for name in CLASSES}
+        self._lock = threading.Lock()
+        self._service = LatencyTracker()
+        self.waits = {name: LatencyTracker() for name in CLASSES}
+        self.counts = {name: {'admitted': 0, 'rejected': 0, 'timed_out': 0} for name in CLASSES}
+
+    def retry_after(self):
+        """Rough seconds until the current backlog has drained"""
+        service = self._service.p95() or 1.0
+        backlog = sum(len(queue) for queue in self._queues.values()) + self.active
+        return max(1, math.ceil(backlog * service / self.max_active))
+
+    def acquire(self, priority):
+        """
+        Wait for a running slot. Returns None when admitted, or
+        (status, retry_after) when the request is shed.
+        """
+        start = time.monotonic()
+        with self._lock:
+            waiting = any(self._queues[name] for name in CLASSES[:CLASSES.index(priority) + 1])
+            if self.active < self.max_active and not waiting:
+                self.active += 1
+                self._admitted(priority, 0.0)
+                return None
+            if len(self._queues[priority]) >= self.queue_limits[priority]:
+                self.counts[priority]['rejected'] += 1
+                return 429, self.retry_after()
+            ticket = threading.Event()
+            self._queues[priority].append(ticket)
+
+        ticket.wait(self.max_wait[priority])
+        with self._lock:
+            if ticket.is_set():
+                # Handed a slot by release()
+                self._admitted(priority, time.monotonic() - start)
+                return None
+            self._queues[priority].remove(ticket)
+            self.counts[priority]['timed_out'] += 1
+            return 503, self.retry_after()
+
+    def _admitted(self, priority, waited):
+        self.counts[priority]['admitted'] += 1
+        self.waits[priority].record(waited)
+
+    def release(self, elapsed):
+        """Free a slot, handing it straight to the next waiter in priority order"""
+        self._service.record(elapsed)
+        with self._lock:
+            for name in CLASSES:
+                if self._queues[name]:
+                    self._queues[name].popleft().set()
+                    return
+            self.active -= 1
+
+    def queue_depth(self, priority):
+        return len(self._queues[priority])
+
+
+admission = AdmissionController()
+upstream_buckets = {}
+
+
+def set_process_count(processes):
+    """Split each provider's quota across `processes` workers, each holding its own buckets"""
+    upstream_buckets.clear()
+    for name, limits in ADMISSION_CONFIG['upstreams'].items():
+        upstream_buckets[name] = TokenBucket(limits['rate'] / processes,
+                                             max(1, limits['burst'] / processes),
+                                             ADMISSION_CONFIG['upstream_reserve'])
+
+
+set_process_count(ADMISSION_CONFIG['processes'])
+
+
+def request_class():
+    """Priority class of the current request (background outside of requests)"""
+    if not has_request_context():
+        return 'background'
+    return g.get('request_class', 'interactive')
+
+
+def acquire_upstream(name):
+    """Spend one request of an upstream's budget; raises UpstreamThrottled when it is exhausted"""
+    bucket = upstream_buckets.get(name)
+    if bucket is None:
+        return
+    retry_after = bucket.take(request_class())
+    if retry_after:
+        if has_request_context():
+            g.retry_after = retry_after
+        raise UpstreamThrottled(name, retry_after)
+
+
+def _trusted():
+    token = ADMISSION_CONFIG['token']
+    supplied = request.headers.get('X-Admission-Token')
+    return bool(token) and supplied is not None and hmac.compare_digest(supplied, token)
+
+
+def _classify():
+    default = ADMISSION_CONFIG['routes'].get(request.endpoint)
+    if default is None:
+        return None  # Pages, static files, streams and metrics are not queued
+    requested = request.headers.get('X-Request-Class')
+    if requested not in CLASSES:
+        return default
+    # Anyone may lower their class; raising it needs the admission token
+    if CLASSES.index(requested) < CLASSES.index(default) and not _trusted():
+        return default
+    return requested
+
+
+def metrics_text():
+    """Admission and upstream metrics in the Prometheus text format"""
+    lines = [
+        '# TYPE forestfire_admission_active gauge',
+        f'forestfire_admission_active {admission.active}',
+        '# TYPE forestfire_admission_queue_depth gauge'
+    ]
+    lines += [f'forestfire_admission_queue_depth{{class="{name}"}} {admission.queue_depth(name)}'
+              for name in CLASSES]
+    lines.append('# TYPE forestfire_admission_wait_p95_seconds gauge')
+    lines += [f'forestfire_admission_wait_p95_seconds{{class="{name}"}} {admission.waits[name].p95() or 0:.4f}'
+              for name in CLASSES]
+    lines.append('# TYPE forestfire_admission_requests_total counter')
+    for name in CLASSES:
+        for outcome, count in admission.counts[name].items():
+            lines.append(f'forestfire_admission_requests_total{{class="{name}",outcome="{outcome}"}} {count}')
+    lines.append('# TYPE forestfire_upstream_tokens gauge')
+    lines += [f'forestfire_upstream_tokens{{upstream="{name}"}} {bucket.available():.2f}'
+              for name, bucket in upstream_buckets.items()]
+    lines.append('# TYPE forestfire_upstream_throttled_total counter')
+    lines += [f'forestfire_upstream_throttled_total{{upstream="{name}"}} {bucket.throttled}'
+              for name, bucket in upstream_buckets.items()]
+    return '\n'.join(lines) + '\n'
+
+
+def install(app):
+    """Register the admission hooks and the /metrics route"""
+    if not ADMISSION_CONFIG['enabled']:
+        return
+
+    @app.before_request
+    def admit():
+        priority = _classify()
+        if priority is None:
+            return None
+        g.request_class = priority
+        shed = admission.acquire(priority)
+        if shed is not None:
+            status, retry_after = shed
+            response = Response('{"error": "Server busy, retry later"}\n', status=status,
+                                mimetype='application/json')
+            response.headers['Retry-After'] = str(retry_after)
+            return response
+        g.admitted_at = time.monotonic()
+        return None
+
+    @app.after_request
+    def add_retry_after(response):
+        retry_after = g.get('retry_after')
+        if retry_after and response.status_code in (429, 503) and 'Retry-After' not in response.headers:
+            response.headers['Retry-After'] = str(max(1, math.ceil(retry_after)))
+        return response
+
+    @app.teardown_request
+    def release(exc):
+        admitted_at = g.pop('admitted_at', None)
+        if admitted_at is not None:
+            admission.release(time.monotonic() - admitted_at)
+
+    @app.route('/metrics')
+    def metrics():
+        return Response(metrics_text(), mimetype='text/plain; version=0.0.4')
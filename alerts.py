@@ -0,0 +1,387 @@
+import fcntl
+import hashlib
+import json
+import math
+import os
+import queue
+import threading
+import time
+import tempfile
+import uuid
+from collections import defaultdict
+from contextlib import contextmanager
+
+import requests
+
+from config import ALERT_CONFIG, SPATIAL_INDEX_CONFIG
+from fire_fusion import haversine_km, KM_PER_DEGREE
+from spatial_index import cells_in_bounds, latlon_to_cell
+from shared_cache import shared_store
+
+
+def point_in_polygon(lat, lon, polygon):
+    """Ray casting test; polygon is a list of [lat, lon] vertices"""
+    inside = False
+    j = len(polygon) - 1
+    for i in range(len(polygon)):
+        lat_i, lon_i = polygon[i]
+        lat_j, lon_j = polygon[j]
+        if (lat_i > lat) != (lat_j > lat):
+            cross_lon = lon_i + (lat - lat_i) * (lon_j - lon_i) / (lat_j - lat_i)
+            if lon < cross_lon:
+                inside = not inside
+        j = i
+    return inside
+
+
+def _validate_subscription(data):
+    """Build a subscription dict from request data, raising ValueError if invalid"""
+    subscription = {
+        'id': data.get('id') or uuid.uuid4().hex,
+        'name': str(data.get('name', '')),
+        'risk_threshold': float(data.get('risk_threshold', ALERT_CONFIG['risk_threshold'])),
+    }
+
+    if 'polygon' in data:
+        polygon = [[float(lat), float(lon)] for lat, lon in data['polygon']]
+        if len(polygon) < 3:
+            raise ValueError('Polygon needs at least 3 vertices')
+        subscription['polygon'] = polygon
+        lats = [lat for lat, _ in polygon]
+        lons = [lon for _, lon in polygon]
+        subscription['bounds'] = [min(lats), min(lons), max(lats), max(lons)]
+    else:
+        lat = float(data['lat'])
+        lon = float(data['lon'])
+        radius_km = float(data.get('radius_km', ALERT_CONFIG['default_radius_km']))
+        if not (-90 <= lat <= 90) or not (-180 <= lon <= 180) or radius_km <= 0:
+            raise ValueError('Invalid coordinates or radius')
+        subscription.update({'lat': lat, 'lon': lon, 'radius_km': radius_km})
+        dlat = radius_km / KM_PER_DEGREE
+        dlon = radius_km / (KM_PER_DEGREE * max(math.cos(math.radians(lat)), 0.01))
+        subscription['bounds'] = [lat - dlat, lon - dlon, lat + dlat, lon + dlon]
+
+    return subscription
+
+
+def _contains(subscription, lat, lon):
+    min_lat, min_lon, max_lat, max_lon = subscription['bounds']
+    # Longitude is compared modulo 360 so boxes crossing the antimeridian match
+    if not (min_lat <= lat <= max_lat and (lon - min_lon) % 360.0 <= max_lon - min_lon):
+        return False
+    if 'polygon' in subscription:
+        return point_in_polygon(lat, lon, subscription['polygon'])
+    return haversine_km(subscription['lat'], subscription['lon'], lat, lon) <= subscription['radius_km']
+
+
+class SubscriptionIndex:
+    """
+    Spatial cell index over subscription bounding boxes.
+
+    A lookup only inspects the subscriptions registered in the query point's
+    cell, so matching a batch costs ~O(detections) regardless of how many
+    subscriptions exist elsewhere. Areas spanning more than `max_cells` cells
+    are kept in a short list that is always checked.
+    """
+
+    def __init__(self, level=SPATIAL_INDEX_CONFIG['alert_level'], max_cells=ALERT_CONFIG['index_max_cells']):
+        self.level = level
+        self.max_cells = max_cells
+        self._cells = defaultdict(set)
+        self._large = set()
+
+    def add(self, subscription_id, bounds):
+        cells = cells_in_bounds(*bounds, self.level, self.max_cells)
+        if cells is None:
+            self._large.add(subscription_id)
+            return
+        for cell in cells:
+            self._cells[cell].add(subscription_id)
+
+    def remove(self, subscription_id, bounds):
+        self._large.discard(subscription_id)
+        for cell in cells_in_bounds(*bounds, self.level, self.max_cells) or []:
+            self._cells[cell].discard(subscription_id)
+            if not self._cells[cell]:
+                del self._cells[cell]
+
+    def candidates(self, lat, lon):
+        found = self._cells.get(latlon_to_cell(lat, lon, self.level))
+        if not self._large:
+            return found or ()
+        return (found or set()) | self._large
+
+
+class FileSink:
+    """Append alerts as JSON lines to a local file"""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def deliver(self, alerts):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._lock, open(self.path, 'a') as f:
+            for alert in alerts:
+                f.write(json.dumps(alert) + '\n')
+
+
+class WebhookSink:
+    """POST alert batches as JSON to a webhook URL"""
+
+    def __init__(self, url, timeout=5):
+        self.url = url
+        self.timeout = timeout
+
+    def deliver(self, alerts):
+        try:
+            requests.post(self.url, json={'alerts': alerts}, timeout=self.timeout)
+        except requests.exceptions.RequestException as e:
+            print(f"Error delivering alerts to webhook: {str(e)}")
+
+
+def make_sink(kind=ALERT_CONFIG['sink'], target=ALERT_CONFIG['sink_target']):
+    """Build the configured alert sink"""
+    if kind == 'webhook':
+        return WebhookSink(target)
+    return FileSink(target)
+
+
+class AlertRegistry:
+    """
+    Geofenced subscriptions matched against fire detections and risk scores.
+
+    The subscriptions file is the source of truth for every worker process:
+    changes are made under a file lock on the latest contents, and each
+    worker reloads its index when the file changes. Dedup state lives in the
+    shared store so an alert goes out once, whichever worker matched it.
+    Request handlers queue their points and a background thread matches and
+    delivers them, so a slow sink never holds up a prediction.
+    """
+
+    def __init__(self, sink=None, path=ALERT_CONFIG['subscriptions_file'],
+                 dedup_seconds=ALERT_CONFIG['dedup_hours'] * 3600, store=None,
+                 queue_size=ALERT_CONFIG['queue_size']):
+        self.sink = sink or make_sink()
+        self.path = path
+        self.dedup_seconds = dedup_seconds
+        self.store = store
+        self._lock = threading.Lock()
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self.dropped = 0
+        self._subscriptions = {}
+        self._index = SubscriptionIndex()
+        self._version = None
+        self._sent = {}
+        with self._lock:
+            self._reload()
+
+    def _file_version(self):
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+    def _reload(self):
+        """Rebuild from the file if another worker changed it (call with self._lock held)"""
+        if not self.path:
+            return
+        version = self._file_version()
+        if version == self._version:
+            return
+        subscriptions = []
+        if version is not None:
+            try:
+                with open(self.path) as f:
+                    subscriptions = [_validate_subscription(data) for data in json.load(f)]
+            except (OSError, ValueError, KeyError) as e:
+                print(f"Error loading alert subscriptions: {str(e)}")
+                return
+        self._subscriptions = {}
+        self._index = SubscriptionIndex()
+        for subscription in subscriptions:
+            self._add(subscription)
+        self._version = version
+
+    def _save(self):
+        directory = os.path.dirname(self.path) or '.'
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.subscriptions-')
+        with os.fdopen(fd, 'w') as f:
+            json.dump(list(self._subscriptions.values()), f)
+        os.replace(tmp_path, self.path)
+        self._version = self._file_version()
+
+    @contextmanager
+    def _editing(self):
+        """Apply a change to the latest subscriptions and persist it, holding the file lock"""
+        with self._lock:
+            if not self.path:
+                yield
+                return
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            with open(self.path + '.lock', 'a') as lock:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+                self._reload()
+                yield
+                self._save()
+
+    def _add(self, subscription):
+        old = self._subscriptions.get(subscription['id'])
+        if old:
+            self._index.remove(old['id'], old['bounds'])
+        self._subscriptions[subscription['id']] = subscription
+        self._index.add(subscription['id'], subscription['bounds'])
+
+    def subscribe(self, data):
+        """Register a point+radius or polygon subscription; returns it"""
+        return self.subscribe_many([data])[0]
+
+    def subscribe_many(self, items):
+        """Register several subscriptions, persisting the registry once"""
+        subscriptions = [_validate_subscription(data) for data in items]
+        with self._editing():
+            for subscription in subscriptions:
+                self._add(subscription)
+        return subscriptions
+
+    def unsubscribe(self, subscription_id):
+        with self._editing():
+            subscription = self._subscriptions.pop(subscription_id, None)
+            if subscription is not None:
+                self._index.remove(subscription_id, subscription['bounds'])
+        return subscription is not None
+
+    def subscriptions(self):
+        with self._lock:
+            self._reload()
+            return list(self._subscriptions.values())
+
+    def _matches(self, lat, lon):
+        for subscription_id in self._index.candidates(lat, lon):
+            subscription = self._subscriptions[subscription_id]
+            if _contains(subscription, lat, lon):
+                yield subscription
+
+    def _first_time(self, key, now):
+        # Deduplicate: only alert once per key within the dedup window
+        if self.store is not None:
+            digest = hashlib.sha1(repr(key).encode()).hexdigest()
+            return self.store.add(f"alert_sent_{digest}", True, ttl=self.dedup_seconds)
+        expires = self._sent.get(key)
+        if expires is not None and expires > now:
+            return False
+        self._sent[key] = now + self.dedup_seconds
+        return True
+
+    def _prune(self, now):
+        if len(self._sent) > ALERT_CONFIG['dedup_max_entries']:
+            self._sent = {key: expires for key, expires in self._sent.items() if expires > now}
+
+    def match_detections(self, fires):
+        """Alert every subscription containing a newly detected fire"""
+        now = time.time()
+        alerts = []
+        with self._lock:
+            self._reload()
+            for fire in fires:
+                try:
+                    lat, lon = float(fire['latitude']), float(fire['longitude'])
+                except (KeyError, TypeError, ValueError):
+                    continue
+                for subscription in self._matches(lat, lon):
+                    if not self._first_time((subscription['id'], 'fire', fire.get('id')), now):
+                        continue
+                    alerts.append({
+                        'type': 'fire_detected',
+                        'subscription_id': subscription['id'],
+                        'subscription_name': subscription['name'],
+                        'latitude': lat,
+                        'longitude': lon,
+                        'satellite': fire.get('satellite'),
+                        'confidence': fire.get('confidence'),
+                        'detection_id': fire.get('id'),
+                        'time': now,
+                    })
+            self._prune(now)
+        self._deliver(alerts)
+        return alerts
+
+    def match_risk(self, points):
+        """Alert subscriptions where a risk score (0-1) crosses their threshold"""
+        now = time.time()
+        alerts = []
+        with self._lock:
+            self._reload()
+            for point in points:
+                lat, lon = float(point['latitude']), float(point['longitude'])
+                probability = float(point['probability'])
+                for subscription in self._matches(lat, lon):
+                    if probability < subscription['risk_threshold']:
+                        continue
+                    key = (subscription['id'], 'risk', round(lat, 2), round(lon, 2))
+                    if not self._first_time(key, now):
+                        continue
+                    alerts.append({
+                        'type': 'high_risk',
+                        'subscription_id': subscription['id'],
+                        'subscription_name': subscription['name'],
+                        'latitude': lat,
+                        'longitude': lon,
+                        'probability': round(probability * 100, 2),
+                        'time': now,
+                    })
+            self._prune(now)
+        self._deliver(alerts)
+        return alerts
+
+    def _deliver(self, alerts):
+        if not alerts:
+            return
+        try:
+            self.sink.deliver(alerts)
+        except Exception as e:
+            print(f"Error delivering alerts: {str(e)}")
+
+    def queue_detections(self, fires):
+        """match_detections() on the background thread"""
+        self._submit(self.match_detections, fires)
+
+    def queue_risk(self, points):
+        """match_risk() on the background thread"""
+        self._submit(self.match_risk, points)
+
+    def _submit(self, match, items):
+        # Drops rather than block the caller if delivery has fallen behind
+        if not items:
+            return
+        self._start()
+        try:
+            self._queue.put_nowait((match, items))
+        except queue.Full:
+            self.dropped += 1
+
+    def _start(self):
+        # Started lazily so forked workers each get their own delivery thread
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._start_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='alert-delivery', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            match, items = self._queue.get()
+            try:
+                match(items)
+            except Exception as e:
+                print(f"Error matching alerts: {str(e)}")
+
+
+# Shared registry used by the Flask app
+alert_registry = AlertRegistry(store=shared_store)
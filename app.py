@@ -1,19 +1,36 @@
-from flask import Flask, render_template, request, jsonify
-import numpy as np
-import pandas as pd
+from flask import Flask, render_template, request, jsonify, Response, stream_with_context
 import requests
 import joblib
-import math
 from datetime import datetime, timedelta
 import os
 import json
-from config import OPENWEATHER_API_KEY, MODEL_CONFIG, NASA_FIRMS_API_KEY
+from config import OPENWEATHER_API_KEY, MODEL_CONFIG, SHARED_CACHE_CONFIG, FIRE_FEED_CONFIG
 import time
+from fire_feed import fire_feed
+from alerts import alert_registry
+from forecast import get_forecast_risk
+from scenarios import sweep
+from fwi import fire_weather_indices, temp_model_frame
+from shared_cache import shared_store
+from spatial_index import location_key
+import profiling
+import admission
+from admission import acquire_upstream
+from audit_log import audit_log, model_version
+from attributions import TreeExplainer
 
 app = Flask(__name__)
+profiling.install(app)
+admission.install(app)
 
-# Load temperature model
+# New fire detections are matched against alert subscriptions
+fire_feed.add_listener(lambda added, removed: alert_registry.queue_detections(added))
+
+# Load temperature model (under gunicorn this runs once in the master and the
+# model is shared copy-on-write with every worker, see gunicorn.conf.py)
 temp_model = joblib.load('models/temp.joblib')
+TEMP_MODEL_VERSION = model_version('models/temp.joblib')
+temp_explainer = TreeExplainer(temp_model, class_name='fire')
 
 # Print feature names for debugging
 print("Temperature Model Features:", temp_model.feature_names_in_ if hasattr(temp_model, 'feature_names_in_') else "No feature names found")
@@ -78,97 +95,22 @@ def get_precipitation(lat, lon):
         print(f"Error getting precipitation data: {str(e)}")
         return None
 
-def calculate_ffmc(temp, humidity, wind, rain):
-    """Calculate Fine Fuel Moisture Code"""
-    # Convert temperature to Celsius
-    temp_c = temp - 273.15
-    
-    # Initial FFMC moisture content
-    mo = 147.2 * (101 - 85) / (59.5 + 85)  # Using average value
-    
-    # Rain effect
-    if rain > 0.5:
-        rf = rain - 0.5
-        mr = mo + 42.5 * rf * np.exp(-100 / (251 - mo)) * (1 - np.exp(-6.93 / rf))
-    else:
-        mr = mo
-
-    # Temperature and humidity effect
-    ed = 0.942 * (humidity / 100) * 6.1078 * np.exp((17.27 * temp_c) / (237.3 + temp_c))
-    ew = 0.618 * (humidity / 100) * 6.1078 * np.exp((17.27 * temp_c) / (237.3 + temp_c))
-    
-    # Drying and wetting factors
-    ko = 0.424 * (1 - (humidity/100)**1.7) + 0.0694 * np.sqrt(wind) * (1 - (humidity/100)**8)
-    kd = ko * 0.581 * np.exp(0.0365 * temp_c)
-    
-    # Final FFMC
-    m = mr + (1000 * kd)
-    ffmc = 59.5 * (250 - m) / (147.2 + m)
-    
-    return max(0, min(101, ffmc))
-
-def calculate_dmc(temp, humidity, rain, prev_dmc=6):
-    """Calculate Duff Moisture Code"""
-    temp_c = temp - 273.15
-    
-    # Rain effect
-    if rain > 1.5:
-        re = 0.92 * rain - 1.27
-        mo = 20 + np.exp(5.6348 - prev_dmc / 43.43)
-        b = 100 / (0.5 + 0.3 * prev_dmc)
-        mr = mo + 1000 * re / (48.77 + b * re)
-        pr = 244.72 - 43.43 * np.log(mr - 20)
-    else:
-        pr = prev_dmc
-        
-    # Temperature and humidity effect
-    k = 1.894 * (temp_c + 1.1) * (100 - humidity) * 1e-6
-    
-    return max(0, pr + 100 * k)
-
-def calculate_dc(temp, rain, prev_dc=15):
-    """Calculate Drought Code"""
-    temp_c = temp - 273.15
-    
-    # Rain effect
-    if rain > 2.8:
-        rd = 0.83 * rain - 1.27
-        Qo = 800 * np.exp(-prev_dc / 400)
-        Qr = Qo + 3.937 * rd
-        dr = 400 * np.log(800 / Qr)
-    else:
-        dr = prev_dc
-        
-    # Temperature effect
-    V = 0.36 * (temp_c + 2.8) + 0.5
-    
-    return max(0, dr + 0.5 * V)
-
-def calculate_isi(ffmc, wind):
-    """Calculate Initial Spread Index"""
-    f = np.exp(2.72 * (0.434 * np.log(101 - ffmc)) ** 0.647)
-    return max(0, 0.208 * f * wind)
-
-def calculate_bui(dmc, dc):
-    """Calculate Buildup Index"""
-    if dmc <= 0.4 * dc:
-        return max(0, 0.8 * dmc * dc / (dmc + 0.4 * dc))
-    else:
-        return max(0, dmc - (1 - 0.8 * dc / (dmc + 0.4 * dc)) * (0.92 + (0.0114 * dmc) ** 1.7))
-
-def calculate_fwi(isi, bui):
-    """Calculate Fire Weather Index"""
-    if bui <= 80:
-        fD = 0.626 * bui ** 0.809 + 2
-    else:
-        fD = 1000 / (25 + 108.64 * np.exp(-0.023 * bui))
-    
-    B = 0.1 * isi * fD
-    
-    if B > 1:
-        return np.exp(2.72 * (0.434 * np.log(B)) ** 0.647)
-    else:
-        return B
+def get_weather_data(lat, lon):
+    """Get current weather, shared across worker processes for a few minutes"""
+    key = location_key('weather', lat, lon)
+    weather_data = shared_store.get(key)
+    if weather_data is not None:
+        return weather_data, 200
+
+    acquire_upstream('openweather')
+    weather_url = f"http://api.openweathermap.org/data/2.5/weather?lat={lat}&lon={lon}&appid={OPENWEATHER_API_KEY}"
+    weather_response = requests.get(weather_url)
+    if weather_response.status_code != 200:
+        return None, weather_response.status_code
+
+    weather_data = weather_response.json()
+    shared_store.put(key, weather_data, ttl=SHARED_CACHE_CONFIG['weather_ttl'])
+    return weather_data, 200
 
 @app.route('/')
 def index():
@@ -187,56 +129,64 @@ def live_map():
 @app.route('/get_fire_data')
 def get_fire_data():
     try:
-        # Base URL for NASA FIRMS API
-        base_url = "https://firms.modaps.eosdis.nasa.gov/api/area/json"
-        
-        # Parameters for India's bounding box
-        params = {
-            'key': NASA_FIRMS_API_KEY,
-            'country': 'INDIA',
-            'time': '24',  # Last 24 hours
-        }
-        
-        all_fire_data = []
-        
-        # Fetch Landsat data without caching
-        landsat_params = params.copy()
-        landsat_params['source'] = 'LANDSAT_NRT'
-        landsat_response = requests.get(base_url, params=landsat_params, timeout=30)
-        if landsat_response.status_code == 200:
-            landsat_data = landsat_response.json()
-            for fire in landsat_data:
-                fire['satellite'] = 'landsat'
-            all_fire_data.extend(landsat_data)
-        
-        # Fetch VIIRS data without caching
-        viirs_params = params.copy()
-        viirs_params['source'] = 'VIIRS_SNPP_NRT'
-        viirs_response = requests.get(base_url, params=viirs_params, timeout=30)
-        if viirs_response.status_code == 200:
-            viirs_data = viirs_response.json()
-            for fire in viirs_data:
-                fire['satellite'] = 'viirs'
-            all_fire_data.extend(viirs_data)
-        
-        # Fetch MODIS data without caching
-        modis_params = params.copy()
-        modis_params['source'] = 'MODIS_NRT'
-        modis_response = requests.get(base_url, params=modis_params, timeout=30)
-        if modis_response.status_code == 200:
-            modis_data = modis_response.json()
-            for fire in modis_data:
-                fire['satellite'] = 'modis'
-            all_fire_data.extend(modis_data)
-        
+        # Served from the shared feed instead of fetching FIRMS per request
+        fire_feed.start()
+        seq, all_fire_data = fire_feed.snapshot()
+        if seq == 0:
+            fire_feed.refresh()
+            seq, all_fire_data = fire_feed.snapshot()
+
+        # ?view=events returns fused multi-sensor fire events instead of raw points
+        if request.args.get('view') == 'events':
+            return jsonify(fire_feed.events())
+
         return jsonify(all_fire_data)
         
     except Exception as e:
         print(f"Error fetching fire data: {str(e)}")
         return jsonify([])
 
+@app.route('/stream_fire_data')
+def stream_fire_data():
+    """Push fire detections as Server-Sent Events: a snapshot, then only changes"""
+    if not fire_feed.acquire_stream():
+        # Every stream pins a worker thread; beyond the cap, clients poll /get_fire_data instead
+        response = jsonify({'error': 'Too many open fire data streams'})
+        response.status_code = 503
+        response.headers['Retry-After'] = str(FIRE_FEED_CONFIG['refresh_interval'])
+        return response
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('since')
+    response = Response(stream_with_context(fire_feed.stream(last_event_id)),
+                        mimetype='text/event-stream')
+    response.call_on_close(fire_feed.release_stream)
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+@app.route('/alerts/subscriptions', methods=['GET'])
+def list_alert_subscriptions():
+    return jsonify(alert_registry.subscriptions())
+
+@app.route('/alerts/subscriptions', methods=['POST'])
+def create_alert_subscription():
+    try:
+        data = request.get_json()
+        # A list registers many areas at once
+        if isinstance(data, list):
+            return jsonify(alert_registry.subscribe_many(data)), 201
+        return jsonify(alert_registry.subscribe(data)), 201
+    except (KeyError, TypeError, ValueError) as e:
+        return jsonify({'error': f'Invalid subscription: {str(e)}'}), 400
+
+@app.route('/alerts/subscriptions/<subscription_id>', methods=['DELETE'])
+def delete_alert_subscription(subscription_id):
+    if not alert_registry.unsubscribe(subscription_id):
+        return jsonify({'error': 'Subscription not found'}), 404
+    return jsonify({'success': True})
+
 @app.route('/predict', methods=['POST'])
 def predict():
+    request_start = time.perf_counter()
     try:
         data = request.get_json()
         lat = float(data['lat'])
@@ -248,13 +198,9 @@ def predict():
 
         # Get weather data
         try:
-            weather_url = f"http://api.openweathermap.org/data/2.5/weather?lat={lat}&lon={lon}&appid={OPENWEATHER_API_KEY}"
-            weather_response = requests.get(weather_url)
-            
-            if weather_response.status_code == 200:
-                weather_data = weather_response.json()
-            else:
-                return jsonify({'error': f'Weather API error: {weather_response.status_code}'}), 503
+            weather_data, status_code = get_weather_data(lat, lon)
+            if weather_data is None:
+                return jsonify({'error': f'Weather API error: {status_code}'}), 503
         except requests.exceptions.RequestException as e:
             return jsonify({'error': f'Weather API request failed: {str(e)}'}), 503
 
@@ -269,12 +215,10 @@ def predict():
             return jsonify({'error': f'Missing weather data: {str(e)}'}), 503
 
         # Calculate Fire Weather Indices
-        ffmc = calculate_ffmc(temp, humidity, wind_speed, rain)
-        dmc = calculate_dmc(temp, humidity, rain)
-        dc = calculate_dc(temp, rain)
-        isi = calculate_isi(ffmc, wind_speed)
-        bui = calculate_bui(dmc, dc)
-        fwi = calculate_fwi(isi, bui)
+        indices = {name: float(value) for name, value in
+                   fire_weather_indices(temp, humidity, wind_speed, rain).items()}
+        ffmc, dmc, dc = indices['FFMC'], indices['DMC'], indices['DC']
+        isi, bui, fwi = indices['ISI'], indices['BUI'], indices['FWI']
 
         # Prepare model features with correct column names
         try:
@@ -284,40 +228,12 @@ def predict():
             current_year = current_date.year
             
             # Temperature model features in exact order from training
-            temp_features = pd.DataFrame([[
-                current_day,    # day
-                current_month,  # month
-                current_year,   # year
-                temp - 273.15,  # Temperature in Celsius
-                humidity,       # RH
-                wind_speed,     # Ws
-                rain,          # Rain
-                ffmc,          # FFMC
-                dmc,           # DMC
-                dc,            # DC
-                isi,           # ISI
-                bui,           # BUI
-                fwi,           # FWI
-                1              # Region (default to region 1)
-            ]], columns=[
-                'day',
-                'month',
-                'year',
-                'Temperature',
-                'RH',
-                'Ws',
-                'Rain',
-                'FFMC',
-                'DMC',
-                'DC',
-                'ISI',
-                'BUI',
-                'FWI',
-                'Region'
-            ])
+            temp_features = temp_model_frame(current_day, current_month, current_year,
+                                             temp, humidity, wind_speed, rain, indices)
 
             # Make prediction using temperature model only
             temp_prob = temp_model.predict_proba(temp_features)[0][1]
+            alert_registry.queue_risk([{'latitude': lat, 'longitude': lon, 'probability': temp_prob}])
 
             # Determine risk level based on temperature model probability
             if temp_prob <= 0.3:
@@ -329,7 +245,19 @@ def predict():
             else:
                 risk_level = "Extreme Risk"
 
-            return jsonify({
+            audit_log.record(
+                'predict',
+                lat=lat, lon=lon,
+                temperature=temp - 273.15, humidity=humidity, wind_speed=wind_speed,
+                pressure=pressure, rain=rain,
+                ffmc=float(ffmc), dmc=float(dmc), dc=float(dc),
+                isi=float(isi), bui=float(bui), fwi=float(fwi),
+                probability=float(temp_prob), risk_level=risk_level,
+                model_version=TEMP_MODEL_VERSION,
+                latency_ms=(time.perf_counter() - request_start) * 1000
+            )
+
+            result = {
                 'risk_level': risk_level,
                 'probability': round(temp_prob * 100, 2),
                 'weather': {
@@ -345,7 +273,13 @@ def predict():
                     'bui': round(bui, 2),
                     'fwi': round(fwi, 2)
                 }
-            })
+            }
+
+            # Optional per-feature contributions to the probability
+            if data.get('explain') or request.args.get('explain'):
+                result['attributions'] = temp_explainer.explain_one(temp_features)
+
+            return jsonify(result)
 
         except Exception as e:
             print(f"Error in prediction: {str(e)}")
@@ -357,8 +291,69 @@ def predict():
         print(f"Unexpected error in predict route: {str(e)}")
         return jsonify({'error': 'An unexpected error occurred'}), 500
 
+@app.route('/forecast', methods=['POST'])
+def forecast():
+    """Multi-day fire risk curve from the OpenWeather forecast series"""
+    try:
+        data = request.get_json()
+        lat = float(data['lat'])
+        lon = float(data['lon'])
+
+        # Input validation
+        if not (-90 <= lat <= 90) or not (-180 <= lon <= 180):
+            return jsonify({'error': 'Invalid coordinates'}), 400
+
+        try:
+            return jsonify(get_forecast_risk(lat, lon, temp_model))
+        except requests.exceptions.RequestException as e:
+            return jsonify({'error': f'Forecast API request failed: {str(e)}'}), 503
+        except KeyError as e:
+            return jsonify({'error': f'Missing forecast data: {str(e)}'}), 503
+
+    except (KeyError, TypeError, ValueError) as e:
+        return jsonify({'error': f'Invalid input: {str(e)}'}), 400
+    except Exception as e:
+        print(f"Unexpected error in forecast route: {str(e)}")
+        return jsonify({'error': 'An unexpected error occurred'}), 500
+
+@app.route('/scenarios', methods=['POST'])
+def scenarios():
+    """What-if risk surface over a grid of temperature/humidity/wind/rain variations"""
+    try:
+        data = request.get_json()
+        ranges = data.get('ranges', {})
+
+        # Base observation given directly, or the current weather at a location
+        base = data.get('base')
+        if base is None:
+            lat = float(data['lat'])
+            lon = float(data['lon'])
+            if not (-90 <= lat <= 90) or not (-180 <= lon <= 180):
+                return jsonify({'error': 'Invalid coordinates'}), 400
+            try:
+                weather_data, status_code = get_weather_data(lat, lon)
+                if weather_data is None:
+                    return jsonify({'error': f'Weather API error: {status_code}'}), 503
+            except requests.exceptions.RequestException as e:
+                return jsonify({'error': f'Weather API request failed: {str(e)}'}), 503
+            base = {
+                'temperature': weather_data['main']['temp'] - 273.15,
+                'humidity': weather_data['main']['humidity'],
+                'wind_speed': weather_data.get('wind', {}).get('speed', 0),
+                'rain': weather_data.get('rain', {}).get('1h', 0)
+            }
+
+        return jsonify(sweep(base, ranges, temp_model))
+
+    except (KeyError, TypeError, ValueError) as e:
+        return jsonify({'error': f'Invalid input: {str(e)}'}), 400
+    except Exception as e:
+        print(f"Unexpected error in scenarios route: {str(e)}")
+        return jsonify({'error': 'An unexpected error occurred'}), 500
+
 @app.route('/predict_new', methods=['POST'])
 def make_prediction():
+    request_start = time.perf_counter()
     try:
         # Get input values from the form
         data = request.get_json()
@@ -371,13 +366,9 @@ def make_prediction():
 
         # Get weather data
         try:
-            weather_url = f"http://api.openweathermap.org/data/2.5/weather?lat={lat}&lon={lon}&appid={OPENWEATHER_API_KEY}"
-            weather_response = requests.get(weather_url)
-            
-            if weather_response.status_code == 200:
-                weather_data = weather_response.json()
-            else:
-                return jsonify({'error': f'Weather API error: {weather_response.status_code}'}), 503
+            weather_data, status_code = get_weather_data(lat, lon)
+            if weather_data is None:
+                return jsonify({'error': f'Weather API error: {status_code}'}), 503
         except requests.exceptions.RequestException as e:
             return jsonify({'error': f'Weather API request failed: {str(e)}'}), 503
 
@@ -392,12 +383,10 @@ def make_prediction():
             return jsonify({'error': f'Missing weather data: {str(e)}'}), 503
 
         # Calculate Fire Weather Indices
-        ffmc = calculate_ffmc(temp, humidity, wind_speed, rain)
-        dmc = calculate_dmc(temp, humidity, rain)
-        dc = calculate_dc(temp, rain)
-        isi = calculate_isi(ffmc, wind_speed)
-        bui = calculate_bui(dmc, dc)
-        fwi = calculate_fwi(isi, bui)
+        indices = {name: float(value) for name, value in
+                   fire_weather_indices(temp, humidity, wind_speed, rain).items()}
+        ffmc, dmc, dc = indices['FFMC'], indices['DMC'], indices['DC']
+        isi, bui, fwi = indices['ISI'], indices['BUI'], indices['FWI']
 
         # Prepare model features with correct column names
         try:
@@ -407,40 +396,12 @@ def make_prediction():
             current_year = current_date.year
             
             # Temperature model features in exact order from training
-            temp_features = pd.DataFrame([[
-                current_day,    # day
-                current_month,  # month
-                current_year,   # year
-                temp - 273.15,  # Temperature in Celsius
-                humidity,       # RH
-                wind_speed,     # Ws
-                rain,          # Rain
-                ffmc,          # FFMC
-                dmc,           # DMC
-                dc,            # DC
-                isi,           # ISI
-                bui,           # BUI
-                fwi,           # FWI
-                1              # Region (default to region 1)
-            ]], columns=[
-                'day',
-                'month',
-                'year',
-                'Temperature',
-                'RH',
-                'Ws',
-                'Rain',
-                'FFMC',
-                'DMC',
-                'DC',
-                'ISI',
-                'BUI',
-                'FWI',
-                'Region'
-            ])
+            temp_features = temp_model_frame(current_day, current_month, current_year,
+                                             temp, humidity, wind_speed, rain, indices)
 
             # Make prediction using temperature model only
             temp_prob = temp_model.predict_proba(temp_features)[0][1]
+            alert_registry.queue_risk([{'latitude': lat, 'longitude': lon, 'probability': temp_prob}])
 
             # Determine risk level based on temperature model probability
             if temp_prob <= 0.3:
@@ -452,6 +413,18 @@ def make_prediction():
             else:
                 risk_level = "Extreme Risk"
 
+            audit_log.record(
+                'predict_new',
+                lat=lat, lon=lon,
+                temperature=temp - 273.15, humidity=humidity, wind_speed=wind_speed,
+                pressure=pressure, rain=rain,
+                ffmc=float(ffmc), dmc=float(dmc), dc=float(dc),
+                isi=float(isi), bui=float(bui), fwi=float(fwi),
+                probability=float(temp_prob), risk_level=risk_level,
+                model_version=TEMP_MODEL_VERSION,
+                latency_ms=(time.perf_counter() - request_start) * 1000
+            )
+
             return jsonify({
                 'success': True,
                 'risk_level': risk_level,
@@ -0,0 +1,97 @@
+"""
+Per-feature attributions for the forest models.
+
+Exact tree-path (Saabas) contributions: along each decision path the change
+in the explained class's probability at every split is credited to the
+split's feature, so for every prediction
+
+    bias + sum(contributions) == predict_proba(X)[:, class_index]
+
+The per-node cumulative contributions of every tree are tabulated once when
+the explainer is built. Explaining a batch is then one leaf lookup per tree
+and a table lookup, well under a millisecond per prediction even for 100 trees.
+"""
+from functools import lru_cache
+
+import joblib
+import numpy as np
+
+
+class TreeExplainer:
+    """Precomputed path contribution tables for a fitted sklearn forest or tree"""
+
+    def __init__(self, model, class_index=1, class_name=None):
+        self.model = model
+        self.class_name = class_name if class_name is not None else str(model.classes_[class_index])
+        trees = getattr(model, 'estimators_', [model])
+        # Low-level trees are walked directly: the forest's apply() dispatches
+        # through joblib, which costs more than the lookups for small batches
+        self._trees = [tree.tree_ for tree in trees]
+        n_features = model.n_features_in_
+        if hasattr(model, 'feature_names_in_'):
+            self.feature_names = [str(name) for name in model.feature_names_in_]
+        else:
+            self.feature_names = [f"feature_{i}" for i in range(n_features)]
+
+        tables, offsets, bias = [], [], []
+        offset = 0
+        for tree in trees:
+            tree = tree.tree_
+            value = tree.value[:, 0, :]
+            value = value[:, class_index] / value.sum(axis=1)
+
+            # Nodes are numbered parents-first, so one pass accumulates each path
+            table = np.zeros((tree.node_count, n_features))
+            for node in range(tree.node_count):
+                feature = tree.feature[node]
+                for child in (tree.children_left[node], tree.children_right[node]):
+                    if child >= 0:
+                        table[child] = table[node]
+                        table[child, feature] += value[child] - value[node]
+
+            tables.append(table)
+            offsets.append(offset)
+            bias.append(value[0])
+            offset += tree.node_count
+
+        self._table = np.concatenate(tables)
+        self._offsets = np.array(offsets)
+        self.bias = float(np.mean(bias))
+
+    def explain(self, X):
+        """Contributions of every feature, shape (n_samples, n_features), for a batch"""
+        X = np.ascontiguousarray(np.asarray(X, dtype=np.float32))
+        contributions = np.zeros((len(X), self._table.shape[1]))
+        # One tree at a time keeps memory at (n_samples, n_features)
+        for tree, offset in zip(self._trees, self._offsets):
+            contributions += self._table[tree.apply(X) + offset]
+        return contributions / len(self._trees)
+
+    def explain_one(self, X):
+        """
+        Attributions of a single prediction for API responses, in probability
+        percentage points, largest effect first
+        """
+        contributions = self.explain(X)[0]
+        order = np.argsort(-np.abs(contributions))
+        return {
+            'class': self.class_name,
+            'bias': round(self.bias * 100, 2),
+            # A list rather than a dict so the order survives JSON key sorting
+            'contributions': [{'feature': self.feature_names[i],
+                               'contribution': round(float(contributions[i]) * 100, 2)}
+                              for i in order]
+        }
+
+
+@lru_cache(maxsize=None)
+def explainer_for(path, label_encoder_path=None, label='fire'):
+    """
+    Explainer for a saved model file, built once per process. Models trained
+    on label-encoded targets explain P(`label`) via their encoder.
+    """
+    model = joblib.load(path)
+    if label_encoder_path is None:
+        return TreeExplainer(model)
+    encoded = joblib.load(label_encoder_path).transform([label])[0]
+    return TreeExplainer(model, list(model.classes_).index(encoded), label)
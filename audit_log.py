@@ -0,0 +1,231 @@
+"""
+Forest Fire Prediction - Prediction audit log
+
+Every prediction (inputs, derived FWI values, probability, model version and
+latency) is put on an in-memory queue and written in batches by a
+background thread, so the request path never waits on disk. Batches go to
+hourly JSON-lines segments under raw/, which are periodically compacted
+into date-partitioned Parquet files under parquet/date=YYYY-MM-DD/.
+
+Usage:
+    python audit_log.py compact
+    python audit_log.py query [--start 2026-10-01] [--end 2026-10-18] [--source predict]
+    python audit_log.py replay --url http://localhost:5000 [--start ...] [--limit 1000]
+"""
+import argparse
+import atexit
+import fcntl
+import glob
+import hashlib
+import json
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+from functools import lru_cache
+
+import pandas as pd
+import requests
+
+from config import AUDIT_CONFIG
+
+
+@lru_cache(maxsize=None)
+def model_version(path):
+    """Short content hash of a model file"""
+    try:
+        with open(path, 'rb') as f:
+            return hashlib.sha1(f.read()).hexdigest()[:12]
+    except OSError:
+        return 'unknown'
+
+
+class PredictionAuditLog:
+    """Non-blocking, batched prediction recorder"""
+
+    def __init__(self, directory=AUDIT_CONFIG['directory'],
+                 batch_size=AUDIT_CONFIG['batch_size'],
+                 flush_interval=AUDIT_CONFIG['flush_interval'],
+                 compact_interval=AUDIT_CONFIG['compact_interval'],
+                 queue_size=AUDIT_CONFIG['queue_size']):
+        self.directory = directory
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.compact_interval = compact_interval
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self.dropped = 0
+
+    def record(self, source, **fields):
+        """Queue one prediction record; drops it rather than block if the queue is full"""
+        if not AUDIT_CONFIG['enabled']:
+            return
+        fields['timestamp'] = datetime.utcnow().isoformat()
+        fields['source'] = source
+        self._start()
+        try:
+            self._queue.put_nowait(fields)
+        except queue.Full:
+            self.dropped += 1
+
+    def _start(self):
+        # Started lazily so forked workers each get their own writer thread
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._start_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='audit-log', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        last_compact = time.time()
+        while True:
+            batch = self._next_batch()
+            if batch:
+                try:
+                    self._write(batch)
+                except OSError as e:
+                    print(f"Error writing prediction audit log: {str(e)}")
+            if time.time() - last_compact > self.compact_interval:
+                last_compact = time.time()
+                try:
+                    compact(self.directory)
+                except Exception as e:
+                    print(f"Error compacting prediction audit log: {str(e)}")
+
+    def _next_batch(self):
+        batch = []
+        deadline = time.time() + self.flush_interval
+        while len(batch) < self.batch_size:
+            timeout = deadline - time.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=timeout))
+            except queue.Empty:
+                break
+        return batch
+
+    def flush(self):
+        """Write everything still queued (runs at interpreter exit)"""
+        batch = []
+        while True:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        if batch:
+            self._write(batch)
+
+    def _write(self, batch):
+        now = datetime.utcnow()
+        segment_dir = os.path.join(self.directory, 'raw', now.strftime('%Y-%m-%d'))
+        os.makedirs(segment_dir, exist_ok=True)
+        path = os.path.join(segment_dir, f"{now.strftime('%H')}-{os.getpid()}.jsonl")
+        with open(path, 'a') as f:
+            f.write(''.join(json.dumps(record, default=str) + '\n' for record in batch))
+
+
+def compact(directory=AUDIT_CONFIG['directory']):
+    """Fold closed hourly JSON-lines segments into Parquet partitions"""
+    os.makedirs(directory, exist_ok=True)
+    current_hour = datetime.utcnow().strftime('%Y-%m-%d/%H')
+
+    with open(os.path.join(directory, '.compact.lock'), 'a') as lock:
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return 0  # Another process is compacting
+
+        compacted = 0
+        for day_dir in sorted(glob.glob(os.path.join(directory, 'raw', '*'))):
+            day = os.path.basename(day_dir)
+            segments = [path for path in sorted(glob.glob(os.path.join(day_dir, '*.jsonl')))
+                        if f"{day}/{os.path.basename(path)[:2]}" < current_hour]
+            if not segments:
+                continue
+
+            frame = pd.concat([pd.read_json(path, lines=True) for path in segments], ignore_index=True)
+            partition = os.path.join(directory, 'parquet', f"date={day}")
+            os.makedirs(partition, exist_ok=True)
+            frame.to_parquet(os.path.join(partition, f"part-{int(time.time() * 1000)}.parquet"),
+                             index=False)
+            for path in segments:
+                os.remove(path)
+            compacted += len(frame)
+        return compacted
+
+
+def read_records(directory=AUDIT_CONFIG['directory'], start=None, end=None, source=None):
+    """Compacted records, optionally limited to a date range (YYYY-MM-DD) and source"""
+    files = []
+    for partition in sorted(glob.glob(os.path.join(directory, 'parquet', 'date=*'))):
+        day = partition.rsplit('=', 1)[1]
+        if (start and day < start) or (end and day > end):
+            continue
+        files.extend(sorted(glob.glob(os.path.join(partition, '*.parquet'))))
+    if not files:
+        return pd.DataFrame()
+
+    frame = pd.concat([pd.read_parquet(path) for path in files], ignore_index=True)
+    if source:
+        frame = frame[frame['source'] == source]
+    return frame.sort_values('timestamp', ignore_index=True)
+
+
+def replay(records, base_url):
+    """Re-send recorded requests to a running server; returns per-request latencies in ms"""
+    routes = {'predict': '/predict', 'predict_new': '/predict_new'}
+    latencies = []
+    session = requests.Session()
+    session.headers['X-Request-Class'] = 'bulk'  # Replays must not crowd out live traffic
+    for record in records.itertuples(index=False):
+        route = routes.get(record.source)
+        if route is None:
+            continue
+        start = time.perf_counter()
+        session.post(base_url + route, json={'lat': record.lat, 'lon': record.lon}, timeout=60)
+        latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+
+# Shared audit log used by the prediction routes
+audit_log = PredictionAuditLog()
+atexit.register(audit_log.flush)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('command', choices=['compact', 'query', 'replay'])
+    parser.add_argument('--start')
+    parser.add_argument('--end')
+    parser.add_argument('--source')
+    parser.add_argument('--url', default='http://localhost:5000')
+    parser.add_argument('--limit', type=int)
+    args = parser.parse_args()
+
+    if args.command == 'compact':
+        print(f"Compacted {compact()} records")
+        return
+
+    records = read_records(start=args.start, end=args.end, source=args.source)
+    if args.limit:
+        records = records.head(args.limit)
+
+    if args.command == 'query':
+        print(records.to_string())
+        return
+
+    latencies = sorted(replay(records, args.url))
+    if not latencies:
+        print("No replayable records")
+        return
+    print(f"Replayed {len(latencies)} requests")
+    print(f"p50: {latencies[len(latencies) // 2]:.1f} ms")
+    print(f"p95: {latencies[int(len(latencies) * 0.95)]:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
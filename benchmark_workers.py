@@ -0,0 +1,119 @@
+"""
+Forest Fire Prediction - Multi-worker scaling benchmark
+
+Starts gunicorn (gunicorn.conf.py) with 1, 2, 4 and 8 workers and measures
+/predict throughput. Weather for the test locations is seeded into the
+shared store first, so the benchmark measures our serving path and model
+scoring rather than the OpenWeather API.
+
+Usage:
+    python benchmark_workers.py [--duration 10] [--clients 32]
+"""
+import argparse
+import http.client
+import json
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+
+from config import SHARED_CACHE_CONFIG
+from shared_cache import shared_store
+from spatial_index import location_key
+
+PORT = 5055
+LOCATIONS = [(round(random.uniform(8, 35), 2), round(random.uniform(69, 96), 2)) for _ in range(200)]
+
+
+def seed_weather():
+    """Put synthetic current weather for every test location in the shared store"""
+    for lat, lon in LOCATIONS:
+        shared_store.put(location_key('weather', lat, lon), {
+            'main': {'temp': random.uniform(290, 315), 'humidity': random.uniform(10, 90), 'pressure': 1010},
+            'wind': {'speed': random.uniform(0, 12)},
+        }, ttl=SHARED_CACHE_CONFIG['weather_ttl'])
+
+
+def wait_until_up(timeout=60):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            conn = http.client.HTTPConnection('127.0.0.1', PORT, timeout=1)
+            conn.request('GET', '/predict')
+            conn.getresponse().read()
+            return True
+        except OSError:
+            time.sleep(0.2)
+    return False
+
+
+def run_load(duration, clients):
+    """Hammer /predict from `clients` threads; returns (requests, errors, latencies)"""
+    stop_at = time.time() + duration
+    lock = threading.Lock()
+    latencies = []
+    errors = [0]
+
+    def client():
+        conn = http.client.HTTPConnection('127.0.0.1', PORT, timeout=30)
+        local, local_errors = [], 0
+        while time.time() < stop_at:
+            lat, lon = random.choice(LOCATIONS)
+            body = json.dumps({'lat': lat, 'lon': lon})
+            start = time.perf_counter()
+            try:
+                conn.request('POST', '/predict', body, {'Content-Type': 'application/json'})
+                response = conn.getresponse()
+                response.read()
+                if response.status != 200:
+                    local_errors += 1
+            except (OSError, http.client.HTTPException):
+                local_errors += 1
+                conn.close()
+                conn = http.client.HTTPConnection('127.0.0.1', PORT, timeout=30)
+            local.append(time.perf_counter() - start)
+        with lock:
+            latencies.extend(local)
+            errors[0] += local_errors
+
+    threads = [threading.Thread(target=client) for _ in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return len(latencies), errors[0], sorted(latencies)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--duration', type=float, default=10)
+    parser.add_argument('--clients', type=int, default=32)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8])
+    args = parser.parse_args()
+
+    seed_weather()
+    print(f"{'workers':>8} {'req/s':>10} {'p50 ms':>10} {'p95 ms':>10} {'errors':>8}")
+    print("-" * 50)
+
+    for workers in args.workers:
+        env = dict(os.environ, WEB_CONCURRENCY=str(workers), BIND=f'127.0.0.1:{PORT}')
+        server = subprocess.Popen([sys.executable, '-m', 'gunicorn', 'app:app'],
+                                  env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            if not wait_until_up():
+                print(f"{workers:>8} server did not start")
+                continue
+            run_load(1, args.clients)  # Warm up
+            count, errors, latencies = run_load(args.duration, args.clients)
+            p50 = latencies[len(latencies) // 2] * 1000 if latencies else 0
+            p95 = latencies[int(len(latencies) * 0.95)] * 1000 if latencies else 0
+            print(f"{workers:>8} {count / args.duration:>10.1f} {p50:>10.1f} {p95:>10.1f} {errors:>8}")
+        finally:
+            server.terminate()
+            server.wait()
+
+
+if __name__ == "__main__":
+    main()
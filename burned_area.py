@@ -0,0 +1,136 @@
+import io
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+import requests
+from sklearn.neighbors import BallTree
+
+from config import NASA_FIRMS_API_KEY, BURNED_AREA_CONFIG
+from admission import acquire_upstream
+
+EARTH_RADIUS_KM = 6371.0
+
+FIRMS_AREA_CSV_URL = "https://firms.modaps.eosdis.nasa.gov/api/area/csv/{key}/{source}/{bbox}/{days}"
+
+
+def fetch_recent_detections():
+    """Download the last few days of FIRMS detections over the configured area as a DataFrame"""
+    frames = []
+    for source in BURNED_AREA_CONFIG['sources']:
+        url = FIRMS_AREA_CSV_URL.format(key=NASA_FIRMS_API_KEY, source=source,
+                                        bbox=BURNED_AREA_CONFIG['bbox'],
+                                        days=BURNED_AREA_CONFIG['days'])
+        acquire_upstream('firms')
+        response = requests.get(url, timeout=60)
+        response.raise_for_status()
+        if response.text.strip():
+            frames.append(pd.read_csv(io.StringIO(response.text), usecols=['latitude', 'longitude']))
+    if not frames:
+        return pd.DataFrame(columns=['latitude', 'longitude'])
+    return pd.concat(frames, ignore_index=True)
+
+
+class BurnedAreaUnavailable(RuntimeError):
+    """No detections have been loaded yet, so a zero count would not mean no fire"""
+
+
+class BurnedAreaIndex:
+    """
+    Haversine ball tree over recently detected fires.
+
+    Replaces a FIRMS download per prediction: detections are ingested in the
+    background and refreshed every `refresh_interval` seconds (failed
+    downloads are retried after `retry_interval`), and radius queries (count
+    and nearest distance) run locally, for one point or a whole batch.
+    Queries raise BurnedAreaUnavailable until the first download succeeds.
+    """
+
+    def __init__(self, fetch=fetch_recent_detections,
+                 refresh_interval=BURNED_AREA_CONFIG['refresh_interval'],
+                 retry_interval=BURNED_AREA_CONFIG['retry_interval']):
+        self.fetch = fetch
+        self.refresh_interval = refresh_interval
+        self.retry_interval = retry_interval
+        self._tree = None
+        self._loaded_at = None
+        self._failed_at = None
+        self._refreshing = False
+        self._lock = threading.Lock()
+
+    def ingest(self, latitudes, longitudes):
+        """Replace the indexed detections"""
+        points = np.radians(np.column_stack([
+            np.asarray(latitudes, dtype=float),
+            np.asarray(longitudes, dtype=float)
+        ]))
+        tree = BallTree(points, metric='haversine') if len(points) else None
+        with self._lock:
+            self._tree = tree
+            self._loaded_at = time.time()
+            self._failed_at = None
+
+    def refresh(self):
+        try:
+            detections = self.fetch()
+            self.ingest(detections['latitude'].values, detections['longitude'].values)
+        except Exception as e:
+            print(f"Error refreshing burned area detections: {str(e)}")
+            with self._lock:
+                # Keep serving the previous detections (if any) and retry soon
+                self._failed_at = time.time()
+        finally:
+            with self._lock:
+                self._refreshing = False
+
+    def _ensure_fresh(self):
+        """Start a background refresh when the detections are missing or old"""
+        now = time.time()
+        with self._lock:
+            stale = self._loaded_at is None or now - self._loaded_at > self.refresh_interval
+            backing_off = self._failed_at is not None and now - self._failed_at < self.retry_interval
+            if not stale or backing_off or self._refreshing:
+                return
+            self._refreshing = True
+        threading.Thread(target=self.refresh, name='burned-area-refresh', daemon=True).start()
+
+    def query(self, latitudes, longitudes, radius_km=BURNED_AREA_CONFIG['radius_km']):
+        """
+        Detections within `radius_km` of each query point.
+
+        Returns (counts, nearest_km) arrays; nearest_km is NaN where there is
+        no detection inside the radius. Raises BurnedAreaUnavailable while the
+        first download is pending or failing.
+        """
+        self._ensure_fresh()
+        points = np.radians(np.column_stack([
+            np.atleast_1d(np.asarray(latitudes, dtype=float)),
+            np.atleast_1d(np.asarray(longitudes, dtype=float))
+        ]))
+        with self._lock:
+            if self._loaded_at is None:
+                raise BurnedAreaUnavailable("Burned area detections are not loaded yet")
+            tree = self._tree
+
+        counts = np.zeros(len(points), dtype=int)
+        nearest_km = np.full(len(points), np.nan)
+        if tree is None or not len(points):
+            return counts, nearest_km
+
+        radius = radius_km / EARTH_RADIUS_KM
+        counts = tree.query_radius(points, r=radius, count_only=True)
+        distance, _ = tree.query(points, k=1)
+        distance_km = distance[:, 0] * EARTH_RADIUS_KM
+        nearest_km = np.where(counts > 0, distance_km, np.nan)
+        return counts, nearest_km
+
+    def query_point(self, lat, lon, radius_km=BURNED_AREA_CONFIG['radius_km']):
+        """(count, nearest_km or None) for a single location"""
+        counts, nearest_km = self.query([lat], [lon], radius_km)
+        nearest = float(nearest_km[0])
+        return int(counts[0]), None if np.isnan(nearest) else nearest
+
+
+# Shared index used by the prediction code
+burned_area_index = BurnedAreaIndex()
@@ -6,6 +6,9 @@ from config import OPENWEATHER_API_KEY
 import math
 from datetime import datetime
 import random
+import time
+from audit_log import audit_log, model_version
+from attributions import explainer_for
 
 def get_weather_data(lat, lon):
     """Get weather data from OpenWeather API"""
@@ -51,8 +54,9 @@ def calculate_wind_features(wind_speed, lat, lon):
     wind_gust = wind_speed * (1 + 0.2 * random.random())
     return wind_direction, wind_gust
 
-def get_combined_prediction(lat, lon, nir_value=0.5, red_value=0.3, burned_area=0.0):
-    """Get combined prediction from both models"""
+def get_combined_prediction(lat, lon, nir_value=0.5, red_value=0.3, burned_area=0.0, explain=False):
+    """Get combined prediction from both models (explain=True adds vegetation model attributions)"""
+    start = time.perf_counter()
     try:
         # Load models
         temp_model = joblib.load('models/temp.joblib')
@@ -107,8 +111,20 @@ def get_combined_prediction(lat, lon, nir_value=0.5, red_value=0.3, burned_area=
         
         # Calculate average prediction
         avg_prediction = (temp_pred_proba + veg_pred_proba) / 2
+
+        audit_log.record(
+            'combined',
+            lat=lat, lon=lon,
+            temperature=temp - 273.15, humidity=humidity, wind_speed=wind_speed,
+            pressure=pressure, ndvi=ndvi, burned_area=burned_area,
+            temperature_probability=float(temp_pred_proba),
+            vegetation_probability=float(veg_pred_proba),
+            probability=float(avg_prediction), risk_level=get_risk_level(avg_prediction),
+            model_version=f"{model_version('models/temp.joblib')}+{model_version('models/veg.joblib')}",
+            latency_ms=(time.perf_counter() - start) * 1000
+        )
         
-        return {
+        result = {
             'temperature_prediction': float(temp_pred_proba),
             'vegetation_prediction': float(veg_pred_proba),
             'average_prediction': float(avg_prediction),
@@ -123,6 +139,9 @@ def get_combined_prediction(lat, lon, nir_value=0.5, red_value=0.3, burned_area=
                 'snow_probability': snow_prob * 100
             }
         }
+        if explain:
+            result['attributions'] = {'vegetation': explainer_for('models/veg.joblib', 'models/veg_label_encoder.joblib').explain_one(veg_features)}
+        return result
         
     except Exception as e:
         return f"Error: {str(e)}"
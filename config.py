@@ -1,9 +1,14 @@
+import os
+
 # OpenWeatherMap API Key
 OPENWEATHER_API_KEY = "b"
 
 # NASA FIRMS API Key
 NASA_FIRMS_API_KEY = 'd'
 
+# NASA Earthdata API Key (MODIS subsets)
+NASA_API_KEY = os.environ.get('NASA_API_KEY', '')
+
 # Model Configuration
 MODEL_CONFIG = {
     'temperature': {
@@ -18,4 +23,167 @@ MODEL_CONFIG = {
 # API Endpoints
 API_ENDPOINTS = {
     'openweather': 'http://api.openweathermap.org/data/2.5/weather'
-}
\ No newline at end of file
+}
+
+# Live fire feed (shared NASA FIRMS fetch loop)
+FIRE_FEED_CONFIG = {
+    'refresh_interval': 60,     # Seconds between upstream FIRMS fetches
+    'history_size': 256,        # Deltas kept so reconnecting clients can resume
+    'heartbeat_interval': 15,   # Seconds between SSE keep-alive comments
+    'poll_interval': 5,         # Seconds between checks of the shared snapshot
+    'max_streams': int(os.environ.get('FIRE_FEED_MAX_STREAMS', 16))  # Open SSE streams per worker
+}
+
+# Cross-satellite hotspot fusion into fire events
+FUSION_CONFIG = {
+    'radius_km': 2.0,       # Max distance between detections of one event
+    'window_hours': 24      # Max time between detections of one event
+}
+
+# Geofenced alert subscriptions
+ALERT_CONFIG = {
+    'subscriptions_file': 'data/alerts/subscriptions.json',
+    'sink': 'file',                     # 'file' or 'webhook'
+    'sink_target': 'data/alerts/alerts.jsonl',  # File path or webhook URL
+    'default_radius_km': 10.0,
+    'risk_threshold': 0.6,              # Probability that triggers a risk alert
+    'dedup_hours': 6,                   # Same alert is not resent within this window
+    'dedup_max_entries': 100000,
+    'index_max_cells': 4096,            # Larger areas are checked on every lookup
+    'queue_size': 1000                  # Pending matches before new ones are dropped
+}
+
+# Multi-day risk forecast
+FORECAST_CONFIG = {
+    'url': 'http://api.openweathermap.org/data/2.5/forecast',
+    'issuance_hours': 3,        # Forecasts are reissued every 3 hours
+    'cache_size': 1024          # Locations kept in the forecast cache
+}
+
+# What-if scenario sweeps (/scenarios)
+SCENARIO_CONFIG = {
+    'max_scenarios': 200000,        # Largest grid scored in one request
+    'max_steps': 101                # Largest min/max/steps axis
+}
+
+# Admission control and upstream request budgets (admission.py)
+ADMISSION_CONFIG = {
+    'enabled': True,
+    'max_active': 6,                # Requests running at once per process
+    'queue_limits': {               # Waiting requests per class before 429
+        'interactive': 32,
+        'bulk': 8,
+        'background': 4
+    },
+    'max_wait': {                   # Seconds a request may wait before 503
+        'interactive': 2.0,
+        'bulk': 10.0,
+        'background': 30.0
+    },
+    'routes': {                     # Endpoint -> default class; others are not queued
+        'predict': 'interactive',
+        'make_prediction': 'interactive',
+        'forecast': 'interactive',
+        'get_fire_data': 'interactive',
+        'scenarios': 'bulk',
+        'create_alert_subscription': 'bulk'
+    },
+    'token': os.environ.get('ADMISSION_TOKEN'),  # X-Admission-Token lets trusted callers raise their class
+    'upstreams': {                  # Provider quotas (requests/second, burst) for all processes
+        'openweather': {'rate': 1.0, 'burst': 60},
+        'firms': {'rate': 8.0, 'burst': 100}
+    },
+    'upstream_reserve': 0.2,        # Share of each bucket only interactive requests may use
+    'processes': int(os.environ.get('WEB_CONCURRENCY', 1))  # Quotas are split across workers (set by gunicorn.conf.py)
+}
+
+# Cross-process snapshot store shared by all workers
+SHARED_CACHE_CONFIG = {
+    'directory': None,          # Defaults to /dev/shm/forestfire-cache-<uid> (mode 0700)
+    'weather_ttl': 600,         # Seconds current weather is reused per location
+    'sweep_interval': 300,      # Seconds between removals of expired entries
+    'memo_size': 1024           # Decoded entries kept per process
+}
+
+# On-demand request profiling (off unless enabled)
+PROFILING_CONFIG = {
+    'enabled': os.environ.get('PROFILING_ENABLED') == '1',
+    'sample_rate': float(os.environ.get('PROFILING_SAMPLE_RATE', 0.0)),  # Fraction of requests profiled
+    'interval': 0.005,                  # Seconds between stack samples
+    'output_dir': 'profiles',           # Where .folded flamegraph files are written
+    'flush_interval': 10,               # Seconds between merges of a worker's buffered samples
+    'token': os.environ.get('PROFILING_TOKEN')  # Required for X-Profile and /profiles
+}
+
+# Per-request latency budget for upstream calls in main.predict
+DEADLINE_CONFIG = {
+    'budget': 3.0,                  # Seconds; responses are returned within this bound
+    'timeouts': {                   # Per-upstream deadlines within the budget
+        'weather': 2.0,
+        'modis': 2.5,
+        'burned_area': 2.0,
+        'location': 1.5
+    },
+    'default_hedge_after': 1.0,     # Hedge delay until enough latencies are recorded
+    'min_samples': 20,              # Latencies needed before using the p95
+    'window': 200,                  # Recent latencies kept per upstream
+    'max_workers': 32,
+    'last_known_size': 4096         # Locations kept for stale fallbacks
+}
+
+# Local index of recent FIRMS detections for burned-area features
+BURNED_AREA_CONFIG = {
+    'sources': ['VIIRS_SNPP_NRT', 'MODIS_NRT'],
+    'bbox': '68,6,98,38',           # west,south,east,north (India)
+    'days': 7,                      # Detections from the last week
+    'radius_km': 1.0,               # Default query radius
+    'refresh_interval': 3600,       # Seconds between background refreshes
+    'retry_interval': 60            # Seconds before retrying a failed refresh
+}
+
+# Prediction audit log
+AUDIT_CONFIG = {
+    'enabled': True,
+    'directory': 'data/audit',
+    'batch_size': 500,              # Records per write
+    'flush_interval': 1.0,          # Max seconds a record waits in memory
+    'compact_interval': 900,        # Seconds between Parquet compactions
+    'queue_size': 10000             # Records dropped (not blocked on) beyond this
+}
+
+# Spatial cell levels (cells are 180 / 2**level degrees across)
+SPATIAL_INDEX_CONFIG = {
+    'cache_level': 14,              # ~1.2 km: weather cache and last-known values
+    'forecast_level': 12,           # ~4.9 km: forecast cache
+    'alert_level': 10,              # ~20 km: alert subscription index
+    'fire_level': 14                # Cell attached to each fire detection
+}
+
+# Tiled scanning of large satellite/aerial scenes with the image models
+SCENE_SCAN_CONFIG = {
+    'model': 'models/transfer_learning_model.h5',
+    'tile_size': 224,               # Input size of the ImageNotebooks models
+    'stride': 112,                  # Half-tile overlap
+    'batch_size': 32,
+    'workers': os.cpu_count() or 1,
+    'threshold': 0.5,               # Tile fire probability counted as a detection
+    'fire_class_index': 0,          # flow_from_directory labels 'fire' 0, so the sigmoid is P(no fire)
+    'output_dir': 'data/scans'
+}
+
+# Nationwide scoring from gridded weather files (weather_grid.py)
+GRID_CONFIG = {
+    'drop_dir': 'data/weather_grids',   # Where CSV/NetCDF/GRIB weather grids are dropped
+    'output_dir': 'data/grid_scores',   # Memory-mapped weather and score arrays
+    'bbox': (6.0, 68.0, 37.5, 97.5),    # India: min_lat, min_lon, max_lat, max_lon
+    'resolution': 0.05,                 # Degrees
+    'chunk_rows': 64,                   # Grid rows scored (or resampled) at a time
+    'csv_chunk_size': 100000,           # CSV lines read at a time
+    'time_index': -1,                   # NetCDF/GRIB time step to score (-1 = latest)
+    'variables': {                      # NetCDF/GRIB variable names, first match wins
+        'temperature': ['t2m', 'temperature', 'temp', 'tas'],
+        'humidity': ['rh', 'r2', 'humidity', 'hurs'],
+        'wind_speed': ['si10', 'wind_speed', 'ws', 'sfcWind'],
+        'rain': ['tp', 'rain', 'precipitation', 'pr']
+    }
+}
@@ -0,0 +1,161 @@
+"""
+Deadline-aware calls to upstream APIs.
+
+Every upstream call runs against a per-request latency budget. Once a call
+has been outstanding longer than that upstream's recent p95 latency, a
+hedged duplicate is started and whichever finishes first wins. When the
+budget runs out the caller falls back to the last value seen for the same
+location, and reports the part as degraded.
+"""
+import threading
+import time
+from collections import deque, OrderedDict
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from config import DEADLINE_CONFIG
+
+_executor = ThreadPoolExecutor(max_workers=DEADLINE_CONFIG['max_workers'],
+                               thread_name_prefix='upstream')
+
+
+class LatencyTracker:
+    """Recent latencies of one upstream, for its p95"""
+
+    def __init__(self, window=DEADLINE_CONFIG['window']):
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, seconds):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def p95(self):
+        with self._lock:
+            if len(self._samples) < DEADLINE_CONFIG['min_samples']:
+                return None
+            samples = sorted(self._samples)
+        return samples[int(len(samples) * 0.95) - 1]
+
+
+_trackers = {}
+_trackers_lock = threading.Lock()
+
+
+def tracker(name):
+    with _trackers_lock:
+        if name not in _trackers:
+            _trackers[name] = LatencyTracker()
+        return _trackers[name]
+
+
+class Budget:
+    """Latency budget for one request"""
+
+    def __init__(self, seconds=DEADLINE_CONFIG['budget']):
+        self.deadline = time.monotonic() + seconds
+
+    def remaining(self):
+        return max(0.0, self.deadline - time.monotonic())
+
+
+class DeadlineExceeded(Exception):
+    pass
+
+
+class HedgedCall:
+    """
+    Upstream call started immediately in the background.
+
+    result() waits until the call's deadline (its own timeout or the request
+    budget, whichever is sooner), hedging once the upstream's p95 has passed.
+    """
+
+    def __init__(self, name, fn, args, budget):
+        self.name = name
+        self.fn = fn
+        self.args = args
+        self.start = time.monotonic()
+        timeout = DEADLINE_CONFIG['timeouts'].get(name)
+        self.deadline = min(budget.deadline, self.start + timeout) if timeout else budget.deadline
+        self._tracker = tracker(name)
+        self._futures = [_executor.submit(self._timed)]
+        self.hedged = False
+
+    def _timed(self):
+        start = time.monotonic()
+        result = self.fn(*self.args)
+        self._tracker.record(time.monotonic() - start)
+        return result
+
+    def result(self):
+        p95 = self._tracker.p95()
+        hedge_after = p95 if p95 is not None else DEADLINE_CONFIG['default_hedge_after']
+        hedge_at = self.start + hedge_after
+
+        pending = set(self._futures)
+        while True:
+            # A call that already finished counts even if it is collected late
+            done = {future for future in pending if future.done()}
+            pending -= done
+            for future in done:
+                if future.exception() is None:
+                    return future.result()
+
+            now = time.monotonic()
+            if now >= self.deadline:
+                break
+            if not self.hedged and (now >= hedge_at or not pending):
+                # Primary is slower than usual (or failed): race a duplicate
+                self.hedged = True
+                future = _executor.submit(self._timed)
+                self._futures.append(future)
+                pending.add(future)
+            if not pending:
+                break
+            wake_at = hedge_at if not self.hedged and hedge_at < self.deadline else self.deadline
+            wait(pending, timeout=max(0.0, wake_at - now), return_when=FIRST_COMPLETED)
+
+        raise DeadlineExceeded(f"{self.name} did not finish within its deadline")
+
+
+_last_known = OrderedDict()
+_last_known_lock = threading.Lock()
+
+
+def resolve(call, key):
+    """
+    Result of a call and a degraded flag: None when fresh, 'stale' when the
+    last known value for `key` was used, 'missing' when there is none.
+    A None result counts as a failure, like the fetch helpers return on error.
+    """
+    cache_key = (call.name, key)
+    try:
+        value = call.result()
+    except Exception as e:
+        print(f"Error in {call.name} call: {str(e)}")
+        value = None
+
+    if value is not None:
+        with _last_known_lock:
+            _last_known[cache_key] = value
+            _last_known.move_to_end(cache_key)
+            while len(_last_known) > DEADLINE_CONFIG['last_known_size']:
+                _last_known.popitem(last=False)
+        return value, None
+
+    with _last_known_lock:
+        value = _last_known.get(cache_key)
+    return value, 'stale' if value is not None else 'missing'
+
+
+def resolve_all(calls, key):
+    """
+    resolve() for a dict of calls, as {name: (value, degraded)}. All calls
+    are awaited together up to the earliest deadline first, so the order
+    they are collected in does not matter.
+    """
+    if calls:
+        timeout = min(call.deadline for call in calls.values()) - time.monotonic()
+        wait([future for call in calls.values() for future in call._futures],
+             timeout=max(0.0, timeout))
+    return {name: resolve(call, key) for name, call in calls.items()}
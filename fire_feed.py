@@ -0,0 +1,304 @@
+import json
+import threading
+import time
+import uuid
+
+import requests
+
+from config import NASA_FIRMS_API_KEY, FIRE_FEED_CONFIG, SPATIAL_INDEX_CONFIG
+from spatial_index import latlon_to_cell, cell_token
+from fire_fusion import fuse_detections
+from shared_cache import shared_store
+from admission import acquire_upstream
+
+FIRMS_URL = "https://firms.modaps.eosdis.nasa.gov/api/area/json"
+
+# Satellite name used in the app -> FIRMS source
+FIRMS_SOURCES = {
+    'landsat': 'LANDSAT_NRT',
+    'viirs': 'VIIRS_SNPP_NRT',
+    'modis': 'MODIS_NRT',
+}
+
+
+def detection_id(fire):
+    """Stable identifier for a single FIRMS detection"""
+    return ':'.join(str(fire.get(key, '')) for key in
+                    ('satellite', 'latitude', 'longitude', 'acq_date', 'acq_time'))
+
+
+def fetch_fire_detections():
+    """
+    Fetch the last 24 hours of detections over India from every FIRMS source.
+    Raises if any source fails: a partial result would look like that
+    sensor's detections had all expired.
+    """
+    params = {
+        'key': NASA_FIRMS_API_KEY,
+        'country': 'INDIA',
+        'time': '24',  # Last 24 hours
+    }
+
+    all_fire_data = []
+    for satellite, source in FIRMS_SOURCES.items():
+        source_params = params.copy()
+        source_params['source'] = source
+        acquire_upstream('firms')
+        response = requests.get(FIRMS_URL, params=source_params, timeout=30)
+        response.raise_for_status()
+        fire_data = response.json()
+        cells = cell_token(latlon_to_cell(
+            [fire['latitude'] for fire in fire_data],
+            [fire['longitude'] for fire in fire_data],
+            SPATIAL_INDEX_CONFIG['fire_level']
+        ))
+        for fire, cell in zip(fire_data, cells):
+            fire['satellite'] = satellite
+            fire['id'] = detection_id(fire)
+            fire['cell'] = str(cell)
+        all_fire_data.extend(fire_data)
+
+    return all_fire_data
+
+
+class FireFeed:
+    """
+    Single upstream FIRMS fetch loop shared by every connected client.
+
+    Each refresh is diffed against the previous snapshot; changes are numbered
+    with an increasing sequence so clients can resume from the last one seen.
+
+    With a shared store, only one worker process fetches FIRMS per interval.
+    The snapshot, sequence number and recent deltas are kept together in the
+    store, so every worker publishes the same numbering and a client can
+    reconnect to any of them. Event IDs carry the feed's epoch as well, so an
+    ID from before the store was reset gets a fresh snapshot.
+    """
+
+    STORE_KEY = 'fire_feed_state'
+
+    def __init__(self, fetch=fetch_fire_detections,
+                 interval=FIRE_FEED_CONFIG['refresh_interval'],
+                 history_size=FIRE_FEED_CONFIG['history_size'],
+                 poll_interval=FIRE_FEED_CONFIG['poll_interval'],
+                 store=None, max_streams=FIRE_FEED_CONFIG['max_streams']):
+        self.fetch = fetch
+        self.interval = interval
+        self.history_size = history_size
+        self.poll_interval = poll_interval
+        self.store = store
+        # Each open stream holds a server thread for as long as the client stays
+        self._stream_slots = threading.BoundedSemaphore(max_streams)
+        self._cond = threading.Condition()
+        self._state = _empty_state()
+        self._events = None
+        self._listeners = []
+        self._thread = None
+
+    def start(self):
+        """Start the background fetch loop (idempotent)"""
+        with self._cond:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name='fire-feed', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            try:
+                self.refresh()
+            except Exception as e:
+                # Store or lock I/O errors must not end the shared poller
+                print(f"Error refreshing fire feed: {str(e)}")
+            time.sleep(self.poll_interval if self.store is not None else self.interval)
+
+    def _fetch(self):
+        try:
+            fires = self.fetch()
+        except Exception as e:
+            print(f"Error fetching fire data: {str(e)}")
+            return None
+        return fires
+
+    def _advance(self, state, fires):
+        """Feed state after a fetch, with the delta (added, removed); None, None if unchanged"""
+        for fire in fires:
+            fire.setdefault('id', detection_id(fire))
+        latest = {fire['id']: fire for fire in fires}
+        added = [fire for fid, fire in latest.items() if fid not in state['fires']]
+        removed = [fid for fid in state['fires'] if fid not in latest]
+        if not added and not removed and state['seq'] > 0:
+            return state, None, None
+
+        seq = state['seq'] + 1
+        history = (state['history'] + [(seq, added, removed)])[-self.history_size:]
+        return dict(state, seq=seq, fires=latest, history=history), added, removed
+
+    def _load(self):
+        """
+        Return (state, added, removed). added/removed are only set when this
+        process fetched a change; state is None when nothing is available.
+        """
+        if self.store is None:
+            fires = self._fetch()
+            if fires is None:
+                return None, None, None
+            return self._advance(self._state, fires)
+
+        age = self.store.age(self.STORE_KEY)
+        if age is not None and age < self.interval:
+            return self.store.get(self.STORE_KEY), None, None
+
+        with self.store.lock(self.STORE_KEY, blocking=False) as acquired:
+            if acquired:
+                # Another worker may have refreshed while we waited for the lock
+                state = self.store.get(self.STORE_KEY)
+                age = self.store.age(self.STORE_KEY)
+                if state is None or age >= self.interval:
+                    fires = self._fetch()
+                    if fires is None:
+                        return state, None, None
+                    state, added, removed = self._advance(state or _empty_state(), fires)
+                    self.store.put(self.STORE_KEY, state)  # Also marks the state fresh
+                    return state, added, removed
+                return state, None, None
+
+        return self.store.get(self.STORE_KEY), None, None
+
+    def refresh(self):
+        """Load the latest state once and publish it if anything changed"""
+        state, added, removed = self._load()
+        if state is None:
+            return False
+
+        with self._cond:
+            if (state['epoch'], state['seq']) == (self._state['epoch'], self._state['seq']):
+                return False
+            self._state = state
+            self._cond.notify_all()
+            # Listeners run once per upstream change, in the worker that fetched it
+            listeners = list(self._listeners) if added is not None else []
+
+        for listener in listeners:
+            try:
+                listener(added, removed)
+            except Exception as e:
+                print(f"Error in fire feed listener: {str(e)}")
+        return True
+
+    def add_listener(self, listener):
+        """Register listener(added, removed), called after every published delta"""
+        with self._cond:
+            self._listeners.append(listener)
+
+    def snapshot(self):
+        """Return (seq, detections) for the current state"""
+        with self._cond:
+            return self._state['seq'], list(self._state['fires'].values())
+
+    def events(self):
+        """Fused fire events for the current snapshot, computed once per published change"""
+        with self._cond:
+            position = (self._state['epoch'], self._state['seq'])
+            if self._events is not None and self._events[0] == position:
+                return self._events[1]
+            fires = list(self._state['fires'].values())
+        events = fuse_detections(fires)
+        with self._cond:
+            self._events = (position, events)
+        return events
+
+    def changes_since(self, seq):
+        """
+        Deltas published after `seq`, or None if they are no longer held
+        and the client has to start again from a snapshot.
+        """
+        with self._cond:
+            current, history = self._state['seq'], self._state['history']
+            if seq > current:
+                return None
+            if seq == current:
+                return []
+            if not history or history[0][0] > seq + 1:
+                return None
+            return [change for change in history if change[0] > seq]
+
+    def _position(self):
+        with self._cond:
+            return self._state['epoch'], self._state['seq']
+
+    def _resume_seq(self, last_event_id):
+        """Sequence number to resume from, or None if the ID is from another epoch or malformed"""
+        epoch, _, seq = str(last_event_id or '').rpartition('-')
+        if epoch != self._position()[0] or not seq.isdigit():
+            return None
+        return int(seq)
+
+    def wait(self, position, timeout):
+        """Block until the feed moves past `position` (epoch, seq) or timeout expires"""
+        with self._cond:
+            self._cond.wait_for(
+                lambda: (self._state['epoch'], self._state['seq']) != position, timeout=timeout)
+            return self._state['epoch'], self._state['seq']
+
+    def _snapshot_message(self):
+        with self._cond:
+            epoch, seq = self._state['epoch'], self._state['seq']
+            fires = list(self._state['fires'].values())
+        return (epoch, seq), _sse_message(epoch, seq, 'snapshot', {'seq': seq, 'fires': fires})
+
+    def acquire_stream(self):
+        """Reserve one of this process's stream slots; False when all are in use"""
+        return self._stream_slots.acquire(blocking=False)
+
+    def release_stream(self):
+        self._stream_slots.release()
+
+    def stream(self, last_event_id=None,
+               heartbeat=FIRE_FEED_CONFIG['heartbeat_interval']):
+        """Server-Sent Events generator: snapshot (or resumed deltas) then live deltas"""
+        self.start()
+        if self._position()[1] == 0:
+            # Pick up the shared state before answering, so resuming works on a fresh worker
+            self.refresh()
+
+        last_seq = self._resume_seq(last_event_id)
+        changes = self.changes_since(last_seq) if last_seq is not None else None
+        if changes is None:
+            position, message = self._snapshot_message()
+            yield message
+        else:
+            position = (self._position()[0], last_seq)
+            for change_seq, added, removed in changes:
+                yield _sse_message(position[0], change_seq, 'delta',
+                                   {'seq': change_seq, 'added': added, 'removed': removed})
+                position = (position[0], change_seq)
+
+        while True:
+            current = self.wait(position, heartbeat)
+            if current == position:
+                yield ': keep-alive\n\n'
+                continue
+
+            changes = self.changes_since(position[1]) if current[0] == position[0] else None
+            if changes is None:
+                # Client fell behind the retained history, or the feed was reset
+                position, message = self._snapshot_message()
+                yield message
+                continue
+            for change_seq, added, removed in changes:
+                yield _sse_message(position[0], change_seq, 'delta',
+                                   {'seq': change_seq, 'added': added, 'removed': removed})
+                position = (position[0], change_seq)
+
+
+def _empty_state():
+    return {'epoch': uuid.uuid4().hex[:12], 'seq': 0, 'fires': {}, 'history': []}
+
+
+def _sse_message(epoch, seq, event, payload):
+    return f"id: {epoch}-{seq}\nevent: {event}\ndata: {json.dumps(payload)}\n\n"
+
+
+# Shared feed used by the Flask app
+fire_feed = FireFeed(store=shared_store)
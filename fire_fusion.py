@@ -0,0 +1,162 @@
+import math
+from collections import defaultdict
+from datetime import datetime
+
+from config import FUSION_CONFIG
+
+EARTH_RADIUS_KM = 6371.0
+KM_PER_DEGREE = 111.32
+
+CONFIDENCE_LEVELS = ['low', 'nominal', 'high']
+
+# FIRMS reports confidence differently per sensor
+_CONFIDENCE_CODES = {
+    'l': 'low', 'low': 'low',
+    'n': 'nominal', 'm': 'nominal', 'nominal': 'nominal', 'medium': 'nominal',
+    'h': 'high', 'high': 'high',
+}
+
+
+def normalize_confidence(confidence):
+    """Map VIIRS (l/n/h), Landsat (L/M/H) and MODIS (0-100) confidence to low/nominal/high"""
+    try:
+        value = float(confidence)
+    except (TypeError, ValueError):
+        return _CONFIDENCE_CODES.get(str(confidence).strip().lower(), 'nominal')
+    if value < 30:
+        return 'low'
+    if value < 80:
+        return 'nominal'
+    return 'high'
+
+
+def detection_time(fire):
+    """Acquisition time of a FIRMS detection (acq_date + HHMM acq_time)"""
+    try:
+        acq_time = str(fire.get('acq_time', 0)).zfill(4)
+        return datetime.strptime(f"{fire['acq_date']} {acq_time}", '%Y-%m-%d %H%M')
+    except (KeyError, ValueError):
+        return None
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """Great-circle distance between two points in kilometres"""
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    a = (math.sin((lat2 - lat1) / 2) ** 2
+         + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2)
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
+
+
+def _cell_size(points, cell_km):
+    # Longitude cells are sized at the highest latitude present, so a cell is
+    # at least cell_km wide everywhere and neighbours never skip a cell
+    max_lat = min(max((abs(lat) for lat, _, _, _ in points), default=0.0), 89.0)
+    lat_size = cell_km / KM_PER_DEGREE
+    lon_size = cell_km / (KM_PER_DEGREE * math.cos(math.radians(max_lat)))
+    return lat_size, lon_size
+
+
+def fuse_detections(fires, radius_km=FUSION_CONFIG['radius_km'],
+                    window_hours=FUSION_CONFIG['window_hours']):
+    """
+    Group detections from every sensor into fire events.
+
+    Two detections belong to the same event when they are within `radius_km`
+    of each other and `window_hours` apart; events are the connected groups.
+    Candidates are found through a grid hash with `radius_km` cells, so each
+    detection is only compared with its own and the 8 neighbouring cells.
+    Within a cell, detections are kept in buckets that all belong to one
+    event, so a bucket already joined is skipped with a single lookup and
+    otherwise only scanned until its first match; a dense cell costs about
+    one comparison per detection instead of one per pair.
+    """
+    points = []
+    for fire in fires:
+        try:
+            points.append((float(fire['latitude']), float(fire['longitude']),
+                           detection_time(fire), fire))
+        except (KeyError, TypeError, ValueError):
+            continue
+
+    parent = list(range(len(points)))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    def union(i, j):
+        root_i, root_j = find(i), find(j)
+        if root_i != root_j:
+            parent[root_j] = root_i
+
+    window_seconds = window_hours * 3600
+    lat_size, lon_size = _cell_size(points, radius_km)
+    # Cell -> buckets of detection indices; every bucket lies within one event
+    grid = defaultdict(list)
+    for i, (lat, lon, when, _) in enumerate(points):
+        cx, cy = int(math.floor(lon / lon_size)), int(math.floor(lat / lat_size))
+        for dx in (-1, 0, 1):
+            for dy in (-1, 0, 1):
+                for bucket in grid.get((cx + dx, cy + dy), ()):
+                    if find(bucket[0]) == find(i):
+                        continue
+                    for j in bucket:
+                        other_lat, other_lon, other_when, _ = points[j]
+                        if (when is not None and other_when is not None
+                                and abs((when - other_when).total_seconds()) > window_seconds):
+                            continue
+                        if haversine_km(lat, lon, other_lat, other_lon) <= radius_km:
+                            union(i, j)
+                            break
+
+        root = find(i)
+        buckets = grid[(cx, cy)]
+        for bucket in buckets:
+            if find(bucket[0]) == root:
+                bucket.append(i)
+                break
+        else:
+            buckets.append([i])
+
+    groups = defaultdict(list)
+    for i in range(len(points)):
+        groups[find(i)].append(points[i])
+
+    events = [_build_event(members) for members in groups.values()]
+    events.sort(key=lambda event: (-CONFIDENCE_LEVELS.index(event['max_confidence']),
+                                   -event['detections']))
+    return events
+
+
+def _build_event(members):
+    lats = [lat for lat, _, _, _ in members]
+    lons = [lon for _, lon, _, _ in members]
+    times = [when for _, _, when, _ in members if when is not None]
+    fires = [fire for _, _, _, fire in members]
+
+    confidence = max((normalize_confidence(fire.get('confidence')) for fire in fires),
+                     key=CONFIDENCE_LEVELS.index)
+    frp = [float(fire['frp']) for fire in fires if fire.get('frp') not in (None, '')]
+    centroid_lat = sum(lats) / len(lats)
+    centroid_lon = sum(lons) / len(lons)
+
+    return {
+        'id': f"event:{min(fire.get('id', '') for fire in fires)}",
+        'latitude': round(centroid_lat, 5),
+        'longitude': round(centroid_lon, 5),
+        'extent': {
+            'min_lat': min(lats),
+            'max_lat': max(lats),
+            'min_lon': min(lons),
+            'max_lon': max(lons),
+        },
+        'max_confidence': confidence,
+        'sensors': sorted({fire.get('satellite', 'unknown') for fire in fires}),
+        'detections': len(fires),
+        'first_seen': min(times).isoformat() if times else None,
+        'last_seen': max(times).isoformat() if times else None,
+        'max_frp': max(frp) if frp else None,
+        'total_frp': round(sum(frp), 2) if frp else None,
+    }
@@ -0,0 +1,132 @@
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+
+import numpy as np
+import requests
+
+import fwi
+from config import OPENWEATHER_API_KEY, FORECAST_CONFIG, SPATIAL_INDEX_CONFIG
+from spatial_index import location_key
+from admission import acquire_upstream
+
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def fetch_forecast(lat, lon):
+    """Get the multi-day 3-hourly forecast series from OpenWeather in one call"""
+    params = {
+        'lat': lat,
+        'lon': lon,
+        'appid': OPENWEATHER_API_KEY,
+    }
+    acquire_upstream('openweather')
+    response = requests.get(FORECAST_CONFIG['url'], params=params, timeout=10)
+    response.raise_for_status()
+    return response.json()
+
+
+def next_issuance(now=None):
+    """Unix time of the next forecast issuance (forecasts update every few hours)"""
+    now = time.time() if now is None else now
+    period = FORECAST_CONFIG['issuance_hours'] * 3600
+    return (int(now // period) + 1) * period
+
+
+def forecast_indices(temp, humidity, wind, rain, days):
+    """
+    Advance FFMC/DMC/DC across a forecast series.
+
+    FFMC carries over from the previous step. DMC and DC are daily codes, so
+    every step of a day starts from the previous day's closing value.
+    """
+    n = len(temp)
+    indices = {name: np.empty(n) for name in ('FFMC', 'DMC', 'DC')}
+    prev_ffmc = fwi.DEFAULT_FFMC
+    day_dmc, day_dc = fwi.DEFAULT_DMC, fwi.DEFAULT_DC
+    prev_dmc, prev_dc = day_dmc, day_dc
+
+    for i in range(n):
+        if i > 0 and days[i] != days[i - 1]:
+            day_dmc, day_dc = prev_dmc, prev_dc
+        prev_ffmc = fwi.ffmc(temp[i], humidity[i], wind[i], rain[i], prev_ffmc)
+        prev_dmc = fwi.dmc(temp[i], humidity[i], rain[i], day_dmc)
+        prev_dc = fwi.dc(temp[i], rain[i], day_dc)
+        indices['FFMC'][i] = prev_ffmc
+        indices['DMC'][i] = prev_dmc
+        indices['DC'][i] = prev_dc
+
+    indices['ISI'] = fwi.isi(indices['FFMC'], wind)
+    indices['BUI'] = fwi.bui(indices['DMC'], indices['DC'])
+    indices['FWI'] = fwi.fwi(indices['ISI'], indices['BUI'])
+    return indices
+
+
+def score_forecast(data, model):
+    """Risk curve for an OpenWeather forecast response, scored in one model call"""
+    steps = data['list']
+    times = [datetime.utcfromtimestamp(step['dt']) for step in steps]
+    temp = np.array([step['main']['temp'] for step in steps], dtype=float)
+    humidity = np.array([step['main']['humidity'] for step in steps], dtype=float)
+    wind = np.array([step.get('wind', {}).get('speed', 0) for step in steps], dtype=float)
+    rain = np.array([step.get('rain', {}).get('3h', 0) for step in steps], dtype=float)
+
+    indices = forecast_indices(temp, humidity, wind, rain, [t.date() for t in times])
+    features = fwi.temp_model_frame(
+        np.array([t.day for t in times]),
+        np.array([t.month for t in times]),
+        np.array([t.year for t in times]),
+        temp, humidity, wind, rain, indices
+    )
+    probability = model.predict_proba(features)[:, 1]
+    levels = fwi.risk_levels(probability)
+
+    curve = []
+    for i, when in enumerate(times):
+        curve.append({
+            'time': when.isoformat() + 'Z',
+            'risk_level': str(levels[i]),
+            'probability': round(float(probability[i]) * 100, 2),
+            'weather': {
+                'temperature': round(float(temp[i]) - 273.15, 2),
+                'humidity': float(humidity[i]),
+                'wind_speed': float(wind[i]),
+                'rain': float(rain[i]),
+                'ffmc': round(float(indices['FFMC'][i]), 2),
+                'dmc': round(float(indices['DMC'][i]), 2),
+                'dc': round(float(indices['DC'][i]), 2),
+                'isi': round(float(indices['ISI'][i]), 2),
+                'bui': round(float(indices['BUI'][i]), 2),
+                'fwi': round(float(indices['FWI'][i]), 2)
+            }
+        })
+
+    peak = int(np.argmax(probability)) if len(probability) else None
+    return {
+        'location': data.get('city', {}).get('name'),
+        'curve': curve,
+        'peak': curve[peak] if peak is not None else None
+    }
+
+
+def get_forecast_risk(lat, lon, model):
+    """Forecast risk curve for a location, cached until the next forecast issuance"""
+    key = location_key('forecast', lat, lon, SPATIAL_INDEX_CONFIG['forecast_level'])
+    now = time.time()
+    with _cache_lock:
+        cached = _cache.get(key)
+        if cached and cached[0] > now:
+            _cache.move_to_end(key)
+            return cached[1]
+
+    result = score_forecast(fetch_forecast(lat, lon), model)
+    result['expires'] = datetime.utcfromtimestamp(next_issuance(now)).isoformat() + 'Z'
+
+    with _cache_lock:
+        _cache[key] = (next_issuance(now), result)
+        _cache.move_to_end(key)
+        while len(_cache) > FORECAST_CONFIG['cache_size']:
+            _cache.popitem(last=False)
+    return result
@@ -0,0 +1,168 @@
+"""
+Vectorized Fire Weather Index calculations.
+
+The single implementation of the FWI formulas, written with numpy so whole
+arrays (forecast series, scenario grids, gridded weather) are scored in one
+pass; app.py's /predict routes call it with scalars. Temperatures are in
+Kelvin like the OpenWeather responses.
+"""
+import numpy as np
+import pandas as pd
+
+# Temperature model features in exact order from training
+TEMP_MODEL_FEATURES = [
+    'day',
+    'month',
+    'year',
+    'Temperature',
+    'RH',
+    'Ws',
+    'Rain',
+    'FFMC',
+    'DMC',
+    'DC',
+    'ISI',
+    'BUI',
+    'FWI',
+    'Region'
+]
+
+# Starting values used by app.py when no previous day is known
+DEFAULT_FFMC = 85.0
+DEFAULT_DMC = 6.0
+DEFAULT_DC = 15.0
+
+
+def ffmc(temp, humidity, wind, rain, prev_ffmc=DEFAULT_FFMC):
+    """Fine Fuel Moisture Code"""
+    temp_c = np.asarray(temp, dtype=float) - 273.15
+    humidity = np.asarray(humidity, dtype=float)
+    rain = np.asarray(rain, dtype=float)
+
+    with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+        # Initial moisture content from the previous FFMC
+        mo = 147.2 * (101 - prev_ffmc) / (59.5 + prev_ffmc)
+
+        # Rain effect
+        rf = np.where(rain > 0.5, rain - 0.5, 1.0)
+        mr = np.where(rain > 0.5,
+                      mo + 42.5 * rf * np.exp(-100 / (251 - mo)) * (1 - np.exp(-6.93 / rf)),
+                      mo)
+
+        # Drying and wetting factors
+        ko = 0.424 * (1 - (humidity / 100) ** 1.7) + 0.0694 * np.sqrt(wind) * (1 - (humidity / 100) ** 8)
+        kd = ko * 0.581 * np.exp(0.0365 * temp_c)
+
+        m = mr + (1000 * kd)
+        value = 59.5 * (250 - m) / (147.2 + m)
+
+    return np.fmin(101, np.fmax(0, value))
+
+
+def dmc(temp, humidity, rain, prev_dmc=DEFAULT_DMC):
+    """Duff Moisture Code"""
+    temp_c = np.asarray(temp, dtype=float) - 273.15
+    humidity = np.asarray(humidity, dtype=float)
+    rain = np.asarray(rain, dtype=float)
+
+    with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+        # Rain effect
+        re = 0.92 * rain - 1.27
+        mo = 20 + np.exp(5.6348 - prev_dmc / 43.43)
+        b = 100 / (0.5 + 0.3 * prev_dmc)
+        mr = mo + 1000 * re / (48.77 + b * re)
+        pr = np.where(rain > 1.5, 244.72 - 43.43 * np.log(mr - 20), prev_dmc)
+
+        # Temperature and humidity effect
+        k = 1.894 * (temp_c + 1.1) * (100 - humidity) * 1e-6
+
+    return np.fmax(0, pr + 100 * k)
+
+
+def dc(temp, rain, prev_dc=DEFAULT_DC):
+    """Drought Code"""
+    temp_c = np.asarray(temp, dtype=float) - 273.15
+    rain = np.asarray(rain, dtype=float)
+
+    with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+        # Rain effect
+        rd = 0.83 * rain - 1.27
+        qo = 800 * np.exp(-prev_dc / 400)
+        qr = qo + 3.937 * rd
+        dr = np.where(rain > 2.8, 400 * np.log(800 / qr), prev_dc)
+
+        # Temperature effect
+        v = 0.36 * (temp_c + 2.8) + 0.5
+
+    return np.fmax(0, dr + 0.5 * v)
+
+
+def isi(ffmc_value, wind):
+    """Initial Spread Index"""
+    with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+        f = np.exp(2.72 * (0.434 * np.log(101 - ffmc_value)) ** 0.647)
+    return np.fmax(0, 0.208 * f * wind)
+
+
+def bui(dmc_value, dc_value):
+    """Buildup Index"""
+    with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+        low = 0.8 * dmc_value * dc_value / (dmc_value + 0.4 * dc_value)
+        high = dmc_value - (1 - 0.8 * dc_value / (dmc_value + 0.4 * dc_value)) * (0.92 + (0.0114 * dmc_value) ** 1.7)
+    return np.fmax(0, np.where(dmc_value <= 0.4 * dc_value, low, high))
+
+
+def fwi(isi_value, bui_value):
+    """Fire Weather Index"""
+    with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+        fd = np.where(bui_value <= 80,
+                      0.626 * bui_value ** 0.809 + 2,
+                      1000 / (25 + 108.64 * np.exp(-0.023 * bui_value)))
+        b = 0.1 * isi_value * fd
+        return np.where(b > 1, np.exp(2.72 * (0.434 * np.log(np.fmax(b, 1))) ** 0.647), b)
+
+
+def fire_weather_indices(temp, humidity, wind, rain,
+                         prev_ffmc=DEFAULT_FFMC, prev_dmc=DEFAULT_DMC, prev_dc=DEFAULT_DC):
+    """All FWI components for arrays of observations"""
+    ffmc_value = ffmc(temp, humidity, wind, rain, prev_ffmc)
+    dmc_value = dmc(temp, humidity, rain, prev_dmc)
+    dc_value = dc(temp, rain, prev_dc)
+    isi_value = isi(ffmc_value, wind)
+    bui_value = bui(dmc_value, dc_value)
+    return {
+        'FFMC': ffmc_value,
+        'DMC': dmc_value,
+        'DC': dc_value,
+        'ISI': isi_value,
+        'BUI': bui_value,
+        'FWI': fwi(isi_value, bui_value),
+    }
+
+
+def temp_model_frame(day, month, year, temp, humidity, wind, rain, indices, region=1):
+    """Temperature model input frame for arrays of observations (temp in Kelvin)"""
+    temp = np.asarray(temp, dtype=float)
+    columns = {
+        'day': day,
+        'month': month,
+        'year': year,
+        'Temperature': temp - 273.15,
+        'RH': humidity,
+        'Ws': wind,
+        'Rain': rain,
+        'Region': region,
+    }
+    columns.update(indices)
+    return pd.DataFrame({name: np.broadcast_to(columns[name], temp.shape).ravel()
+                         for name in TEMP_MODEL_FEATURES})
+
+
+def risk_levels(probability):
+    """Risk level labels for an array of temperature model probabilities"""
+    probability = np.asarray(probability)
+    return np.select(
+        [probability <= 0.3, probability <= 0.6, probability <= 0.8],
+        ['Low Risk', 'Moderate Risk', 'High Risk'],
+        default='Extreme Risk'
+    )
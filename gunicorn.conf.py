@@ -0,0 +1,45 @@
+"""
+Gunicorn configuration for multi-worker serving.
+
+    gunicorn app:app
+
+The app (and the models it loads) is imported once in the master and
+shared copy-on-write with every forked worker. Weather and fire snapshots
+live in shared_cache.SharedStore, so all workers reuse the same entries.
+"""
+import gc
+import multiprocessing
+import os
+import sys
+
+bind = os.environ.get('BIND', '0.0.0.0:5000')
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count()))
+
+# Threaded workers. Each open /stream_fire_data connection holds one thread for its
+# lifetime, so streams are capped per worker at FIRE_FEED_CONFIG['max_streams']
+# (503 above that, and the map falls back to polling) to leave threads for the API.
+# Requests waiting in the admission queues (admission.py) hold an idle thread,
+# so there are more threads than ADMISSION_CONFIG['max_active'] running slots.
+worker_class = 'gthread'
+threads = int(os.environ.get('GUNICORN_THREADS', 32))
+timeout = 60
+
+# Load models in the master before forking
+preload_app = True
+
+
+def when_ready(server):
+    # Move everything loaded so far (models included) out of the GC's tracked
+    # generations, so garbage collections in workers don't touch those pages
+    # and break copy-on-write sharing
+    gc.collect()
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    # Upstream quotas are per process; split them by the worker count gunicorn
+    # actually runs (WEB_CONCURRENCY, -w or the cpu_count default)
+    os.environ['WEB_CONCURRENCY'] = str(server.cfg.workers)
+    admission = sys.modules.get('admission')
+    if admission is not None:  # Already imported in the master by preload_app
+        admission.set_process_count(server.cfg.workers)
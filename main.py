@@ -4,8 +4,13 @@ import requests
 from geopy.geocoders import Nominatim
 import joblib
 import numpy as np
-from config import OPENWEATHER_API_KEY
+from datetime import datetime
+import fwi
+from config import OPENWEATHER_API_KEY, DEADLINE_CONFIG
 from satellite_data import get_modis_data, get_burned_area
+from deadlines import Budget, HedgedCall, resolve_all
+from spatial_index import location_key
+from attributions import explainer_for
 
 app = Flask(__name__)
 
@@ -23,7 +28,7 @@ def get_weather_data(lat, lon):
     }
     
     try:
-        response = requests.get(base_url, params=params)
+        response = requests.get(base_url, params=params, timeout=DEADLINE_CONFIG['timeouts']['weather'])
         response.raise_for_status()
         data = response.json()
         
@@ -59,72 +64,103 @@ def predict():
         data = request.get_json()
         lat = float(data['lat'])
         lon = float(data['lon'])
-        
+        key = location_key('predict', lat, lon)
+
+        # Start every upstream call at once against one latency budget
+        budget = Budget()
+        calls = {
+            'weather': HedgedCall('weather', get_weather_data, (lat, lon), budget),
+            'modis': HedgedCall('modis', get_modis_data, (lat, lon), budget),
+            'burned_area': HedgedCall('burned_area', get_burned_area, (lat, lon), budget),
+            'location': HedgedCall('location', get_location_name, (lat, lon), budget),
+        }
+        results = resolve_all(calls, key)
+        degraded = {name: flag for name, (_, flag) in results.items()}
+        degraded['satellite'] = degraded.pop('modis')
+
         # Get weather data for temperature model
-        weather_params = get_weather_data(lat, lon)
+        weather_params = results['weather'][0]
         if not weather_params:
             return jsonify({'error': 'Could not fetch weather data'})
-        
-        # Get satellite data for vegetation model
-        satellite_params = get_modis_data(lat, lon)
-        if not satellite_params:
-            return jsonify({'error': 'Could not fetch satellite data'})
-            
-        # Get burned area data
-        burned_area = get_burned_area(lat, lon)
-        satellite_params['BURNED_AREA'] = burned_area
-        
-        # Get location name
-        location_name = get_location_name(lat, lon)
-        
+
         # Load and run temperature model
         try:
             temp_model = joblib.load('models/temp.joblib')
-            temp_features = [
-                weather_params['Temperature'],
-                weather_params['RH'],
-                weather_params['Ws'],
-                weather_params['Rain']
-            ]
-            temp_prediction = temp_model.predict([temp_features])[0]
+            # Same 14 features as training: date, weather (Kelvin in) and the FWI codes
+            now = datetime.now()
+            temp = weather_params['Temperature'] + 273.15
+            indices = fwi.fire_weather_indices(temp, weather_params['RH'], weather_params['Ws'], weather_params['Rain'])
+            temp_features = fwi.temp_model_frame(now.day, now.month, now.year, temp, weather_params['RH'],
+                                                 weather_params['Ws'], weather_params['Rain'], indices)
+            temp_prediction = 'fire' if temp_model.predict(temp_features)[0] == 1 else 'no_fire'
         except Exception as e:
             print(f"Error with temperature model: {e}")
             temp_prediction = "Model error"
-            
-        # Load and run vegetation model
-        try:
-            veg_model = joblib.load('models/veg.joblib')
-            veg_features = [
-                satellite_params['NDVI'],
-                satellite_params['LST'],
-                satellite_params['BURNED_AREA']
-            ]
-            veg_prediction = veg_model.predict([veg_features])[0]
-        except Exception as e:
-            print(f"Error with vegetation model: {e}")
-            veg_prediction = "Model error"
-        
-        return jsonify({
+
+        # Get satellite data for vegetation model; skipped if it misses the budget
+        satellite_params = results['modis'][0]
+        burned_area = results['burned_area'][0]  # None when unknown, never assumed to be 0
+
+        # Get location name
+        location_name = results['location'][0]
+        if location_name is None:
+            location_name = f"Location ({lat}, {lon})"
+
+        # Load and run vegetation model; it needs the burned-area flag as a feature
+        veg_prediction = None
+        attributions = None
+        if satellite_params and burned_area is not None:
+            satellite_params = dict(satellite_params, BURNED_AREA=burned_area)
+            try:
+                veg_model = joblib.load('models/veg.joblib')
+                veg_features = [
+                    satellite_params['NDVI'],
+                    satellite_params['LST'],
+                    satellite_params['BURNED_AREA']
+                ]
+                veg_label_encoder = joblib.load('models/veg_label_encoder.joblib')
+                veg_prediction = str(veg_label_encoder.inverse_transform(veg_model.predict([veg_features]))[0])
+                if data.get('explain'):
+                    attributions = explainer_for('models/veg.joblib', 'models/veg_label_encoder.joblib').explain_one([veg_features])
+            except Exception as e:
+                print(f"Error with vegetation model: {e}")
+                veg_prediction = "Model error"
+
+        if veg_prediction is None:
+            # Temperature-only score
+            overall_risk = 'Medium' if temp_prediction == 'fire' else 'Low'
+        else:
+            overall_risk = 'High' if (temp_prediction == 'fire' and veg_prediction == 'fire') else 'Medium' if (temp_prediction == 'fire' or veg_prediction == 'fire') else 'Low'
+
+        parameters_used = {
+            'Weather Parameters': {
+                'Temperature': f"{weather_params['Temperature']}°C",
+                'Relative Humidity': f"{weather_params['RH']}%",
+                'Wind Speed': f"{weather_params['Ws']} m/s",
+                'Rain': f"{weather_params['Rain']} mm"
+            }
+        }
+        if satellite_params:
+            parameters_used['Vegetation Parameters'] = {
+                'NDVI': f"{satellite_params['NDVI']:.2f}",
+                'Land Surface Temperature': f"{satellite_params['LST']}°C",
+                'Burned Area Present': "Unknown" if burned_area is None else "Yes" if burned_area > 0 else "No"
+            }
+
+        result = {
             'location': location_name,
-            'parameters_used': {
-                'Weather Parameters': {
-                    'Temperature': f"{weather_params['Temperature']}°C",
-                    'Relative Humidity': f"{weather_params['RH']}%",
-                    'Wind Speed': f"{weather_params['Ws']} m/s",
-                    'Rain': f"{weather_params['Rain']} mm"
-                },
-                'Vegetation Parameters': {
-                    'NDVI': f"{satellite_params['NDVI']:.2f}",
-                    'Land Surface Temperature': f"{satellite_params['LST']}°C",
-                    'Burned Area Present': "Yes" if burned_area > 0 else "No"
-                }
-            },
+            'parameters_used': parameters_used,
             'predictions': {
                 'temperature_based': temp_prediction,
                 'vegetation_based': veg_prediction,
-                'overall_risk': 'High' if (temp_prediction == 'fire' and veg_prediction == 'fire') else 'Medium' if (temp_prediction == 'fire' or veg_prediction == 'fire') else 'Low'
-            }
-        })
+                'overall_risk': overall_risk
+            },
+            # Parts that missed the latency budget: 'stale' (last known value) or 'missing'
+            'degraded': {part: flag for part, flag in degraded.items() if flag}
+        }
+        if attributions:
+            result['attributions'] = {'vegetation': attributions}
+        return jsonify(result)
         
     except Exception as e:
         return jsonify({'error': str(e)})
@@ -0,0 +1,252 @@
+"""
+On-demand request profiling.
+
+A statistical profiler samples the stacks of selected request threads and
+aggregates them per endpoint into collapsed-stack files
+(`frame;frame;frame count`), which flamegraph.pl, inferno and speedscope
+read directly. Requests are selected by PROFILING_CONFIG['sample_rate'] or
+by sending the X-Profile header. Nothing is registered on the app unless
+PROFILING_CONFIG['enabled'] is set, so there is no overhead when disabled.
+"""
+import atexit
+import fcntl
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+from flask import request, jsonify, abort, send_from_directory
+
+from config import PROFILING_CONFIG
+
+
+def _collapse(frame):
+    """Root-first `;`-joined stack for a frame"""
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+        frame = frame.f_back
+    return ';'.join(reversed(names))
+
+
+class Sampler:
+    """Background thread sampling the stacks of tracked threads every `interval` seconds"""
+
+    def __init__(self, interval=PROFILING_CONFIG['interval']):
+        self.interval = interval
+        self._tracked = {}
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+
+    def track(self, thread_id):
+        with self._lock:
+            self._tracked[thread_id] = Counter()
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='profiler', daemon=True)
+                self._thread.start()
+        self._wakeup.set()
+
+    def untrack(self, thread_id):
+        """Stop sampling a thread and return its stack counts"""
+        with self._lock:
+            return self._tracked.pop(thread_id, Counter())
+
+    def _run(self):
+        while True:
+            with self._lock:
+                thread_ids = list(self._tracked)
+            if not thread_ids:
+                self._wakeup.wait()
+                self._wakeup.clear()
+                continue
+
+            frames = sys._current_frames()
+            for thread_id in thread_ids:
+                frame = frames.get(thread_id)
+                if frame is None:
+                    continue
+                stack = _collapse(frame)
+                with self._lock:
+                    counts = self._tracked.get(thread_id)
+                    if counts is not None:
+                        counts[stack] += 1
+            del frames
+            time.sleep(self.interval)
+
+
+class ProfileStore:
+    """
+    Per-endpoint aggregated stack counts, written as collapsed-stack files.
+    Requests only add to an in-memory buffer; a background thread in each
+    worker merges the buffer into the shared files under a file lock every
+    `flush_interval` seconds (and at exit), so profiled requests never wait
+    on file I/O or on other workers.
+    """
+
+    REQUESTS_FILE = 'requests.json'
+
+    def __init__(self, directory=PROFILING_CONFIG['output_dir'],
+                 flush_interval=PROFILING_CONFIG['flush_interval']):
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()
+        self._buffer_lock = threading.Lock()
+        self._pending = {}
+        self._pending_requests = Counter()
+        self._thread = None
+        # A forked worker must not merge samples its parent still holds
+        os.register_at_fork(after_in_child=self._forget)
+
+    def _forget(self):
+        self._buffer_lock = threading.Lock()
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._pending_requests = Counter()
+        self._thread = None
+
+    def _path(self, name):
+        return os.path.join(self.directory, name)
+
+    @contextmanager
+    def _locked(self):
+        """Hold the directory lock shared by all threads and workers"""
+        with self._lock:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(self._path('.lock'), 'a') as lock:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+                yield
+
+    def _write(self, name, write):
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, prefix=f".{name}-")
+        with os.fdopen(fd, 'w') as f:
+            write(f)
+        os.replace(tmp_path, self._path(name))
+
+    def _read_profile(self, name):
+        profile = Counter()
+        try:
+            with open(self._path(name)) as f:
+                for line in f:
+                    stack, _, count = line.rstrip('\n').rpartition(' ')
+                    if stack:
+                        profile[stack] += int(count)
+        except FileNotFoundError:
+            pass
+        return profile
+
+    def _read_requests(self):
+        try:
+            with open(self._path(self.REQUESTS_FILE)) as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    def add(self, endpoint, counts):
+        if not counts:
+            return
+        self._start()
+        with self._buffer_lock:
+            self._pending.setdefault(endpoint, Counter()).update(counts)
+            self._pending_requests[endpoint] += 1
+
+    def _start(self):
+        # Started lazily so forked workers each get their own flush thread
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._buffer_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='profile-flush', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            time.sleep(self.flush_interval)
+            try:
+                self.flush()
+            except OSError as e:
+                print(f"Error writing profiles: {str(e)}")
+
+    def flush(self):
+        """Merge this worker's buffered samples into the shared files"""
+        with self._buffer_lock:
+            pending, pending_requests = self._pending, self._pending_requests
+            self._pending, self._pending_requests = {}, Counter()
+        if not pending:
+            return
+        try:
+            with self._locked():
+                for endpoint, counts in pending.items():
+                    name = f"{endpoint}.folded"
+                    profile = self._read_profile(name)
+                    profile.update(counts)
+                    self._write(name, lambda f: f.writelines(f"{stack} {count}\n"
+                                                             for stack, count in profile.items()))
+                requests = self._read_requests()
+                for endpoint, count in pending_requests.items():
+                    requests[endpoint] = requests.get(endpoint, 0) + count
+                self._write(self.REQUESTS_FILE, lambda f: json.dump(requests, f))
+        except OSError:
+            # Keep the samples for the next attempt
+            with self._buffer_lock:
+                for endpoint, counts in pending.items():
+                    self._pending.setdefault(endpoint, Counter()).update(counts)
+                self._pending_requests.update(pending_requests)
+            raise
+
+    def listing(self):
+        return [{
+            'file': f"{endpoint}.folded",
+            'endpoint': endpoint,
+            'requests': count,
+            'samples': sum(self._read_profile(f"{endpoint}.folded").values())
+        } for endpoint, count in self._read_requests().items()]
+
+
+def _authorized():
+    token = PROFILING_CONFIG['token']
+    return bool(token) and request.headers.get('X-Profile-Token') == token
+
+
+def install(app):
+    """Register the profiling hooks and /profiles routes when profiling is enabled"""
+    if not PROFILING_CONFIG['enabled']:
+        return
+
+    sampler = Sampler()
+    store = ProfileStore()
+    atexit.register(store.flush)
+
+    @app.before_request
+    def start_profile():
+        header_requested = request.headers.get('X-Profile') and _authorized()
+        if header_requested or random.random() < PROFILING_CONFIG['sample_rate']:
+            request.environ['profiling.thread'] = threading.get_ident()
+            sampler.track(threading.get_ident())
+
+    @app.teardown_request
+    def stop_profile(exc):
+        thread_id = request.environ.pop('profiling.thread', None)
+        if thread_id is not None:
+            store.add(request.endpoint or 'unknown', sampler.untrack(thread_id))
+
+    @app.route('/profiles')
+    def list_profiles():
+        if not _authorized():
+            abort(404)
+        store.flush()
+        return jsonify(store.listing())
+
+    @app.route('/profiles/<path:filename>')
+    def download_profile(filename):
+        if not _authorized():
+            abort(404)
+        store.flush()
+        return send_from_directory(os.path.abspath(store.directory), filename,
+                                   mimetype='text/plain')
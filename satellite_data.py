@@ -1,7 +1,8 @@
 import requests
 import numpy as np
 from datetime import datetime, timedelta
-from config import NASA_API_KEY
+from config import NASA_API_KEY, DEADLINE_CONFIG, BURNED_AREA_CONFIG
+from burned_area import burned_area_index
 import ee
 
 # Correct API endpoint and parameters
@@ -32,7 +33,7 @@ def get_modis_data(lat, lon):
     }
     
     try:
-        response = requests.get(MODIS_API_URL, params=params)
+        response = requests.get(MODIS_API_URL, params=params, timeout=DEADLINE_CONFIG['timeouts']['modis'])
         response.raise_for_status()
         data = response.json()
         
@@ -56,36 +57,23 @@ def get_modis_data(lat, lon):
 
 def get_burned_area(lat, lon):
     """
-    Get burned area information from NASA FIRMS (Fire Information for Resource Management System)
+    Burned area flag from recent NASA FIRMS (Fire Information for Resource Management System)
+    detections within 1 km, looked up in the locally refreshed detection index
     """
-    base_url = "https://firms.modaps.eosdis.nasa.gov/api/area/csv"
-    
-    # Calculate date range (last 7 days)
-    end_date = datetime.now()
-    start_date = end_date - timedelta(days=7)
-    
-    params = {
-        'latitude': lat,
-        'longitude': lon,
-        'radius': 1.0,  # 1km radius
-        'startDate': start_date.strftime('%Y-%m-%d'),
-        'endDate': end_date.strftime('%Y-%m-%d'),
-        'apikey': NASA_API_KEY
+    count, _ = burned_area_index.query_point(lat, lon)
+    return 1.0 if count > 0 else 0.0  # Area has recent fire activity
+
+def get_burned_area_features(latitudes, longitudes, radius_km=BURNED_AREA_CONFIG['radius_km']):
+    """
+    Burned area features for a batch of locations: detection count and
+    distance to the nearest detection (NaN if none) within radius_km
+    """
+    counts, nearest_km = burned_area_index.query(latitudes, longitudes, radius_km)
+    return {
+        'BURNED_AREA': (counts > 0).astype(float),
+        'FIRE_COUNT': counts,
+        'NEAREST_FIRE_KM': nearest_km
     }
-    
-    try:
-        response = requests.get(base_url, params=params)
-        response.raise_for_status()
-        
-        # Parse CSV response to get burned area
-        # This is a simplified calculation
-        if len(response.text.split('\n')) > 1:
-            return 1.0  # Area has recent fire activity
-        return 0.0  # No recent fire activity
-        
-    except requests.RequestException as e:
-        print(f"Error fetching burned area data: {e}")
-        return 0.0
 
 def get_ndvi_lst(lat, lon, start_date, end_date):
     """
@@ -0,0 +1,99 @@
+"""
+What-if scenario sweeps.
+
+Builds the Cartesian grid of temperature/humidity/wind/rain variations
+around a base observation and scores every scenario at once: the FWI
+codes are computed on whole arrays and the temperature model is called a
+single time for the full grid.
+"""
+from datetime import datetime
+
+import numpy as np
+
+import fwi
+from config import SCENARIO_CONFIG
+
+# Sweep axes in grid order, with the range each value is clipped to
+AXES = {
+    'temperature': (-60.0, 60.0),   # Celsius
+    'humidity': (0.0, 100.0),       # Percent
+    'wind_speed': (0.0, 60.0),      # m/s
+    'rain': (0.0, 500.0),           # mm
+}
+
+
+def axis_values(spec, base):
+    """
+    Values along one axis. `spec` is one of:
+      a list of absolute values,
+      {"offsets": [...]} relative to the base value,
+      {"min": .., "max": .., "steps": n} evenly spaced absolute values
+    A missing spec keeps the base value.
+    """
+    if spec is None:
+        return np.array([base], dtype=float)
+    if isinstance(spec, list):
+        values = np.array(spec, dtype=float)
+    elif 'offsets' in spec:
+        values = base + np.array(spec['offsets'], dtype=float)
+    else:
+        steps = int(spec.get('steps', 11))
+        if not 1 <= steps <= SCENARIO_CONFIG['max_steps']:
+            raise ValueError(f"steps must be between 1 and {SCENARIO_CONFIG['max_steps']}")
+        values = np.linspace(float(spec['min']), float(spec['max']), steps)
+    if values.ndim != 1 or not len(values):
+        raise ValueError("Each range needs at least one value")
+    return values
+
+
+def scenario_grid(base, ranges):
+    """Axis values for every swept variable; raises ValueError if the grid is too large"""
+    axes = {}
+    for name, (low, high) in AXES.items():
+        axes[name] = np.clip(axis_values(ranges.get(name), float(base[name])), low, high)
+
+    size = int(np.prod([len(values) for values in axes.values()]))
+    if size > SCENARIO_CONFIG['max_scenarios']:
+        raise ValueError(f"{size} scenarios requested, the limit is {SCENARIO_CONFIG['max_scenarios']}")
+    return axes
+
+
+def sweep(base, ranges, model, when=None):
+    """
+    Risk surface over the scenario grid.
+
+    `base` holds temperature (Celsius), humidity, wind_speed and rain.
+    Probabilities come back shaped (temperature, humidity, wind_speed, rain).
+    """
+    when = when or datetime.now()
+    axes = scenario_grid(base, ranges)
+    temp_c, humidity, wind, rain = (grid.ravel() for grid in
+                                    np.meshgrid(*axes.values(), indexing='ij'))
+    temp = temp_c + 273.15
+
+    indices = fwi.fire_weather_indices(temp, humidity, wind, rain)
+    features = fwi.temp_model_frame(when.day, when.month, when.year,
+                                    temp, humidity, wind, rain, indices)
+    probability = model.predict_proba(features)[:, 1]
+    levels = fwi.risk_levels(probability)
+
+    worst = int(np.argmax(probability))
+    shape = tuple(len(values) for values in axes.values())
+    level_names, level_counts = np.unique(levels, return_counts=True)
+    return {
+        'base': {name: float(base[name]) for name in AXES},
+        'axes': {name: np.round(values, 3).tolist() for name, values in axes.items()},
+        'shape': list(shape),
+        'scenarios': len(probability),
+        'probability': np.round(probability * 100, 2).reshape(shape).tolist(),
+        'risk_levels': {str(name): int(count) for name, count in zip(level_names, level_counts)},
+        'worst': {
+            'temperature': round(float(temp_c[worst]), 3),
+            'humidity': round(float(humidity[worst]), 3),
+            'wind_speed': round(float(wind[worst]), 3),
+            'rain': round(float(rain[worst]), 3),
+            'fwi': round(float(indices['FWI'][worst]), 2),
+            'probability': round(float(probability[worst]) * 100, 2),
+            'risk_level': str(levels[worst])
+        }
+    }
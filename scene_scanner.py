@@ -0,0 +1,250 @@
+"""
+Forest Fire Prediction - Scene scanner
+
+Scans satellite or aerial scenes far larger than memory for fire. The scene
+is memory-mapped and cut into overlapping tiles of the image models' 224x224
+input. Tiles are read window by window and scored in batches on a pool of
+worker threads. The results are reduced to a tile-resolution fire-probability
+heatmap and bounding regions of connected fire tiles. Only the batches in
+flight and the heatmap are held in memory. Scene pages are released once
+their tile row is done, so peak memory does not grow with the scene.
+
+Scenes are .npy arrays or raw interleaved uint8 files (height x width x
+bands). Models are the Keras .h5 files saved by the ImageNotebooks (needs
+tensorflow), or 'colour' for a dependency-free fire-coloured pixel rule.
+
+Usage:
+    python scene_scanner.py scene.npy --model models/transfer_learning_model.h5
+    python scene_scanner.py scene.raw --shape 40000 60000 3 --model colour
+    python scene_scanner.py synthetic.raw --synthetic 20000 20000 --model colour
+"""
+import argparse
+import json
+import mmap
+import os
+import resource
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from scipy import ndimage
+
+from config import SCENE_SCAN_CONFIG
+
+
+def open_scene(path, shape=None):
+    """Memory-map a scene as a (height, width, bands) uint8 array without reading it"""
+    if path.endswith('.npy'):
+        scene = np.load(path, mmap_mode='r')
+    else:
+        if shape is None:
+            raise ValueError("Raw scenes need a shape (height, width, bands)")
+        scene = np.memmap(path, dtype=np.uint8, mode='r', shape=tuple(shape))
+    if scene.ndim == 2:
+        scene = scene[:, :, np.newaxis]
+    if scene.dtype != np.uint8 or scene.ndim != 3:
+        raise ValueError(f"Expected a uint8 (height, width, bands) scene, got {scene.dtype} {scene.shape}")
+    return scene
+
+
+def make_synthetic_scene(path, height, width, fires=20, seed=0):
+    """Write a raw RGB test scene (vegetation noise with fire-coloured patches) row block by row block"""
+    rng = np.random.default_rng(seed)
+    block = 512
+    with open(path, 'wb') as f:
+        for start in range(0, height, block):
+            noise = rng.integers(0, 60, size=(min(block, height - start), width, 3), dtype=np.uint8)
+            noise[:, :, 1] += 60  # Greenish background
+            f.write(noise.tobytes())
+
+    scene = np.memmap(path, dtype=np.uint8, mode='r+', shape=(height, width, 3))
+    for _ in range(fires):
+        row, col = int(rng.integers(0, height)), int(rng.integers(0, width))
+        size = int(rng.integers(50, 400))
+        scene[row:row + size, col:col + size] = (230, 110, 20)
+    scene.flush()
+    return path
+
+
+def tile_origins(size, tile, stride):
+    """Tile start offsets along one axis; the last tile is aligned to the edge"""
+    if size <= tile:
+        return [0]
+    origins = list(range(0, size - tile + 1, stride))
+    if origins[-1] != size - tile:
+        origins.append(size - tile)
+    return origins
+
+
+def read_tile(scene, row, col, tile):
+    """One tile x tile x 3 window, zero-padded at the scene edge"""
+    window = scene[row:row + tile, col:col + tile, :3]
+    if window.shape[2] == 1:
+        window = np.repeat(window, 3, axis=2)
+    if window.shape[:2] != (tile, tile):
+        padded = np.zeros((tile, tile, 3), dtype=np.uint8)
+        padded[:window.shape[0], :window.shape[1]] = window
+        return padded
+    return np.array(window)
+
+
+def _release_rows(scene, end_row):
+    """Drop the mapped pages of scene rows before `end_row` from this process"""
+    mapped = getattr(scene, '_mmap', None)
+    if mapped is None or end_row <= 0:
+        return
+    start = getattr(scene, 'offset', 0) % mmap.ALLOCATIONGRANULARITY
+    end = start + end_row * scene.strides[0]
+    length = (end // mmap.PAGESIZE) * mmap.PAGESIZE
+    if length > 0:
+        mapped.madvise(mmap.MADV_DONTNEED, 0, length)
+
+
+def _batches(scene, rows, cols, tile, batch_size):
+    """Yield ([(i, j), ...], uint8 batch) in scene order, releasing finished rows"""
+    index, tiles = [], []
+    for i, row in enumerate(rows):
+        for j, col in enumerate(cols):
+            index.append((i, j))
+            tiles.append(read_tile(scene, row, col, tile))
+            if len(tiles) == batch_size:
+                yield index, np.stack(tiles)
+                index, tiles = [], []
+        if i + 1 < len(rows):
+            _release_rows(scene, rows[i + 1])
+    if tiles:
+        yield index, np.stack(tiles)
+
+
+def colour_fire_probability(batch):
+    """Fire score per tile from the share of bright red/orange pixels (5% of a tile saturates)"""
+    red = batch[..., 0].astype(np.int16)
+    green = batch[..., 1].astype(np.int16)
+    blue = batch[..., 2].astype(np.int16)
+    fire = (red > 180) & (red > green + 40) & (green > blue)
+    return np.clip(fire.mean(axis=(1, 2)) / 0.05, 0.0, 1.0)
+
+
+def load_predictor(model=SCENE_SCAN_CONFIG['model']):
+    """Batch scoring function: uint8 (n, tile, tile, 3) -> fire probability (n,)"""
+    if model == 'colour':
+        return colour_fire_probability
+
+    from tensorflow.keras.models import load_model  # Only the notebook models need tensorflow
+    keras_model = load_model(model)
+    fire_index = SCENE_SCAN_CONFIG['fire_class_index']
+
+    def predict(batch):
+        # Same 1/255 rescaling as the notebooks' ImageDataGenerator
+        output = keras_model(batch.astype(np.float32) / 255.0, training=False).numpy()[:, 0]
+        return 1.0 - output if fire_index == 0 else output
+
+    return predict
+
+
+def fire_regions(heatmap, rows, cols, tile, shape, threshold):
+    """Bounding boxes (pixel coordinates) of connected groups of tiles at or above `threshold`"""
+    labels, _ = ndimage.label(heatmap >= threshold, structure=np.ones((3, 3)))
+    regions = []
+    for label, (row_slice, col_slice) in enumerate(ndimage.find_objects(labels), start=1):
+        mask = labels[row_slice, col_slice] == label
+        scores = heatmap[row_slice, col_slice][mask]
+        regions.append({
+            'row_min': rows[row_slice.start],
+            'col_min': cols[col_slice.start],
+            'row_max': min(rows[row_slice.stop - 1] + tile, shape[0]),
+            'col_max': min(cols[col_slice.stop - 1] + tile, shape[1]),
+            'tiles': int(mask.sum()),
+            'max_probability': round(float(scores.max()), 4),
+            'mean_probability': round(float(scores.mean()), 4)
+        })
+    regions.sort(key=lambda region: region['max_probability'], reverse=True)
+    return regions
+
+
+def scan_scene(scene, predict,
+               tile=SCENE_SCAN_CONFIG['tile_size'],
+               stride=SCENE_SCAN_CONFIG['stride'],
+               batch_size=SCENE_SCAN_CONFIG['batch_size'],
+               workers=SCENE_SCAN_CONFIG['workers'],
+               threshold=SCENE_SCAN_CONFIG['threshold']):
+    """
+    Score every overlapping tile of a scene.
+
+    Returns a dict with the (tile rows x tile columns) probability heatmap,
+    the tile origins along each axis and the detected fire regions.
+    """
+    rows = tile_origins(scene.shape[0], tile, stride)
+    cols = tile_origins(scene.shape[1], tile, stride)
+    heatmap = np.zeros((len(rows), len(cols)), dtype=np.float32)
+    start = time.perf_counter()
+
+    def collect(item):
+        index, future = item
+        probability = future.result()
+        for (i, j), value in zip(index, probability):
+            heatmap[i, j] = value
+
+    # At most two batches per worker are in flight, which bounds memory
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        for index, batch in _batches(scene, rows, cols, tile, batch_size):
+            pending.append((index, pool.submit(predict, batch)))
+            if len(pending) >= workers * 2:
+                collect(pending.popleft())
+        while pending:
+            collect(pending.popleft())
+
+    return {
+        'heatmap': heatmap,
+        'rows': rows,
+        'cols': cols,
+        'regions': fire_regions(heatmap, rows, cols, tile, scene.shape, threshold),
+        'tiles': heatmap.size,
+        'seconds': time.perf_counter() - start
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('scene')
+    parser.add_argument('--shape', type=int, nargs=3, metavar=('HEIGHT', 'WIDTH', 'BANDS'))
+    parser.add_argument('--synthetic', type=int, nargs=2, metavar=('HEIGHT', 'WIDTH'),
+                        help="Write a synthetic RGB test scene to SCENE first")
+    parser.add_argument('--model', default=SCENE_SCAN_CONFIG['model'])
+    parser.add_argument('--tile', type=int, default=SCENE_SCAN_CONFIG['tile_size'])
+    parser.add_argument('--stride', type=int, default=SCENE_SCAN_CONFIG['stride'])
+    parser.add_argument('--batch-size', type=int, default=SCENE_SCAN_CONFIG['batch_size'])
+    parser.add_argument('--workers', type=int, default=SCENE_SCAN_CONFIG['workers'])
+    parser.add_argument('--threshold', type=float, default=SCENE_SCAN_CONFIG['threshold'])
+    parser.add_argument('--out', default=SCENE_SCAN_CONFIG['output_dir'])
+    args = parser.parse_args()
+
+    if args.synthetic:
+        make_synthetic_scene(args.scene, *args.synthetic)
+        args.shape = (*args.synthetic, 3)
+
+    scene = open_scene(args.scene, args.shape)
+    result = scan_scene(scene, load_predictor(args.model), args.tile, args.stride,
+                        args.batch_size, args.workers, args.threshold)
+
+    os.makedirs(args.out, exist_ok=True)
+    name = os.path.splitext(os.path.basename(args.scene))[0]
+    np.save(os.path.join(args.out, f"{name}_heatmap.npy"), result['heatmap'])
+    with open(os.path.join(args.out, f"{name}_regions.json"), 'w') as f:
+        json.dump({'scene': args.scene, 'shape': list(scene.shape), 'tile': args.tile,
+                   'stride': args.stride, 'rows': result['rows'], 'cols': result['cols'],
+                   'regions': result['regions']}, f, indent=2)
+
+    peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    megapixels = scene.shape[0] * scene.shape[1] / 1e6
+    print(f"Scene {scene.shape[0]}x{scene.shape[1]} ({megapixels:,.0f} MP), {result['tiles']:,} tiles")
+    print(f"Scanned in {result['seconds']:.1f}s ({result['tiles'] / result['seconds']:.0f} tiles/s)")
+    print(f"Fire regions: {len(result['regions'])}")
+    print(f"Peak RSS: {peak_mb:.0f} MB")
+    print(f"Wrote {args.out}/{name}_heatmap.npy and {name}_regions.json")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,188 @@
+import fcntl
+import mmap
+import os
+import pickle
+import struct
+import tempfile
+import stat
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from config import SHARED_CACHE_CONFIG
+
+# Each entry file starts with its expiry time (0 = never), then the pickled value
+_HEADER = struct.Struct('d')
+_MISSING = object()
+
+
+def _default_directory():
+    # /dev/shm is RAM-backed, so entries never touch disk
+    base = '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir()
+    return os.path.join(base, f"forestfire-cache-{os.getuid()}")
+
+
+def _private_directory(path):
+    """
+    Create (or accept) a directory only this user can use. Entries are
+    unpickled on read, so a directory another user could write to would
+    let them run code in the app.
+    """
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    try:
+        os.mkdir(path, 0o700)
+    except FileExistsError:
+        pass
+    info = os.lstat(path)
+    if not stat.S_ISDIR(info.st_mode) or info.st_uid != os.getuid() or info.st_mode & 0o077:
+        raise RuntimeError(f"Shared cache directory {path} must be a directory owned by "
+                           f"this user with mode 0700")
+    return path
+
+
+class SharedStore:
+    """
+    Key/value snapshots shared by every worker process.
+
+    Values are written to a tmpfs file and atomically renamed into place, and
+    read back through mmap. Each process keeps the last values it decoded
+    (a bounded LRU) and only decodes again when the file changes, so large
+    snapshots are not unpickled on every read. Expired entries are removed
+    by a periodic sweep.
+    """
+
+    def __init__(self, directory=None, memo_size=SHARED_CACHE_CONFIG['memo_size'],
+                 sweep_interval=SHARED_CACHE_CONFIG['sweep_interval']):
+        self.directory = _private_directory(
+            directory or SHARED_CACHE_CONFIG['directory'] or _default_directory())
+        self.memo_size = memo_size
+        self.sweep_interval = sweep_interval
+        self._local = OrderedDict()
+        self._lock = threading.Lock()
+        self._last_sweep = time.time()
+
+    def _path(self, key):
+        safe = ''.join(c if c.isalnum() or c in '-_.' else '_' for c in key)
+        return os.path.join(self.directory, safe)
+
+    def put(self, key, value, ttl=None):
+        """Store a value for all workers, optionally expiring after ttl seconds"""
+        expires = time.time() + ttl if ttl else 0.0
+        path = self._path(key)
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, prefix='.tmp-')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(_HEADER.pack(expires))
+                pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+
+        if time.time() - self._last_sweep > self.sweep_interval:
+            self._last_sweep = time.time()
+            threading.Thread(target=self.sweep, name='shared-cache-sweep', daemon=True).start()
+
+    def sweep(self):
+        """Delete expired entries (and abandoned temp files); one worker at a time"""
+        removed = 0
+        with self.lock('.sweep', blocking=False) as acquired:
+            if not acquired:
+                return 0
+            now = time.time()
+            for name in os.listdir(self.directory):
+                path = os.path.join(self.directory, name)
+                try:
+                    if name.startswith('.tmp-'):
+                        if now - os.stat(path).st_mtime > self.sweep_interval:
+                            os.unlink(path)
+                        continue
+                    if name.startswith('.') or name.endswith('.lock'):
+                        continue
+                    with open(path, 'rb') as f:
+                        expires, = _HEADER.unpack(f.read(_HEADER.size))
+                    if expires and expires < now:
+                        os.unlink(path)
+                        removed += 1
+                except (FileNotFoundError, struct.error):
+                    continue
+        return removed
+
+    def get(self, key, default=None):
+        """Value stored by any worker, or default if missing or expired"""
+        entry = self._read(key)
+        if entry is None:
+            return default
+        expires, _, value = entry
+        if expires and expires < time.time():
+            return default
+        return value
+
+    def add(self, key, value, ttl=None):
+        """Store a value only if the key is missing or expired; True if this call stored it"""
+        with self.lock('.add'):
+            if self.get(key, _MISSING) is not _MISSING:
+                return False
+            self.put(key, value, ttl)
+            return True
+
+    def age(self, key):
+        """Seconds since the key was last written, or None if missing"""
+        try:
+            return time.time() - os.stat(self._path(key)).st_mtime
+        except FileNotFoundError:
+            return None
+
+    def _read(self, key):
+        path = self._path(key)
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return None
+
+        version = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            cached = self._local.get(key)
+            if cached and cached[1] == version:
+                self._local.move_to_end(key)
+                return cached
+
+        try:
+            with open(path, 'rb') as f:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                    expires, = _HEADER.unpack_from(data)
+                    value = pickle.loads(data[_HEADER.size:])
+        except (FileNotFoundError, ValueError, EOFError, pickle.UnpicklingError):
+            return None
+
+        entry = (expires, version, value)
+        with self._lock:
+            self._local[key] = entry
+            self._local.move_to_end(key)
+            while len(self._local) > self.memo_size:
+                self._local.popitem(last=False)
+        return entry
+
+    @contextmanager
+    def lock(self, key, blocking=True):
+        """
+        Cross-process lock on a key. Yields True if acquired; with
+        blocking=False yields False immediately when another worker holds it.
+        """
+        with open(self._path(key) + '.lock', 'a') as f:
+            flags = fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB
+            try:
+                fcntl.flock(f, flags)
+            except BlockingIOError:
+                yield False
+                return
+            try:
+                yield True
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+
+# Shared store used by the Flask app
+shared_store = SharedStore()
@@ -0,0 +1,189 @@
+"""
+Forest Fire Prediction - Hierarchical spatial cells
+
+Shared keys for caches, stores and indexes instead of raw float lat/lon.
+At level L the globe is cut into square cells of 180 / 2**L degrees
+(2**L rows of latitude, 2**(L+1) columns of longitude). Each cell is one
+int64: level in bits 58-62, row in bits 29-57, column in bits 0-28. Every
+cell has exactly one parent and four children on the adjacent levels.
+
+All conversions accept numpy arrays as well as scalars. Running this file
+benchmarks lat/lon-to-cell conversion:
+
+    python spatial_index.py [--points 10000000] [--level 14]
+"""
+import numpy as np
+
+from config import SPATIAL_INDEX_CONFIG
+
+MAX_LEVEL = 28
+
+_LEVEL_SHIFT = 58
+_ROW_SHIFT = 29
+_MASK = (1 << 29) - 1
+
+
+def cell_size_deg(level):
+    """Edge length of a cell at `level`, in degrees"""
+    return 180.0 / (1 << level)
+
+
+def level_for_size_km(size_km):
+    """Deepest level whose cells are at least `size_km` across (north-south)"""
+    size_deg = size_km / 111.32
+    level = int(np.floor(np.log2(180.0 / size_deg)))
+    return max(0, min(MAX_LEVEL, level))
+
+
+def _scalar(value, original):
+    return int(value) if np.ndim(original) == 0 else value
+
+
+def latlon_to_cell(lat, lon, level):
+    """Cell id(s) containing the given point(s)"""
+    if isinstance(lat, (int, float)) and isinstance(lon, (int, float)):
+        # Plain Python path: numpy overhead dominates for a single point
+        scale = (1 << level) / 180.0
+        row = min(max(int((lat + 90.0) * scale), 0), (1 << level) - 1)
+        col = min(max(int(((lon + 180.0) % 360.0) * scale), 0), (2 << level) - 1)
+        return (level << _LEVEL_SHIFT) | (row << _ROW_SHIFT) | col
+    lat_in = lat
+    lat = np.asarray(lat, dtype=np.float64)
+    lon = np.asarray(lon, dtype=np.float64)
+    scale = (1 << level) / 180.0
+
+    row = ((lat + 90.0) * scale).astype(np.int64)
+    col = (np.mod(lon + 180.0, 360.0) * scale).astype(np.int64)
+    row = np.clip(row, 0, (1 << level) - 1)
+    col = np.clip(col, 0, (2 << level) - 1)
+
+    cells = (np.int64(level) << _LEVEL_SHIFT) | (row << _ROW_SHIFT) | col
+    return _scalar(cells, lat_in)
+
+
+def cell_level(cell):
+    return _scalar(np.asarray(cell, dtype=np.int64) >> _LEVEL_SHIFT, cell)
+
+
+def _unpack(cell):
+    cell = np.asarray(cell, dtype=np.int64)
+    return cell >> _LEVEL_SHIFT, (cell >> _ROW_SHIFT) & _MASK, cell & _MASK
+
+
+def _pack(level, row, col):
+    return (np.asarray(level, dtype=np.int64) << _LEVEL_SHIFT) | (np.asarray(row, dtype=np.int64) << _ROW_SHIFT) | col
+
+
+def cell_to_bounds(cell):
+    """(min_lat, min_lon, max_lat, max_lon) of the cell(s)"""
+    level, row, col = _unpack(cell)
+    size = 180.0 / (np.int64(1) << level)
+    min_lat = row * size - 90.0
+    min_lon = col * size - 180.0
+    bounds = (min_lat, min_lon, min_lat + size, min_lon + size)
+    if np.ndim(cell) == 0:
+        return tuple(float(value) for value in bounds)
+    return bounds
+
+
+def cell_center(cell):
+    """(lat, lon) centre of the cell(s)"""
+    min_lat, min_lon, max_lat, max_lon = cell_to_bounds(cell)
+    return (min_lat + max_lat) / 2, (min_lon + max_lon) / 2
+
+
+def cell_parent(cell, level=None):
+    """Enclosing cell at `level` (default: one level up)"""
+    cell_lvl, row, col = _unpack(cell)
+    level = cell_lvl - 1 if level is None else level
+    shift = cell_lvl - level
+    return _scalar(_pack(level, row >> shift, col >> shift), cell)
+
+
+def cell_children(cell):
+    """The four cells one level down"""
+    level, row, col = (int(value) for value in _unpack(cell))
+    return [int(_pack(level + 1, (row << 1) + dr, (col << 1) + dc))
+            for dr in (0, 1) for dc in (0, 1)]
+
+
+def cell_neighbors(cell):
+    """Up to eight surrounding cells (longitude wraps around, latitude stops at the poles)"""
+    level, row, col = (int(value) for value in _unpack(cell))
+    rows, cols = 1 << level, 2 << level
+    neighbors = []
+    for dr in (-1, 0, 1):
+        for dc in (-1, 0, 1):
+            if (dr or dc) and 0 <= row + dr < rows:
+                neighbors.append(int(_pack(level, row + dr, (col + dc) % cols)))
+    return neighbors
+
+
+def cell_token(cell):
+    """Compact string form of a cell id, safe for JSON and file names"""
+    if np.ndim(cell) == 0:
+        return format(int(cell), 'x')
+    return np.array([format(int(value), 'x') for value in np.asarray(cell).ravel()])
+
+
+def token_to_cell(token):
+    return int(token, 16)
+
+
+def cells_in_bounds(min_lat, min_lon, max_lat, max_lon, level, max_cells=None):
+    """
+    Cells at `level` covering a bounding box, or None if there would be more
+    than `max_cells` of them. Boxes crossing the antimeridian (max_lon past
+    180, or min_lon past -180) wrap around to the other side.
+    """
+    _, row0, col0 = _unpack(latlon_to_cell(min_lat, min_lon, level))
+    _, row1, col1 = _unpack(latlon_to_cell(max_lat, max_lon, level))
+    row0, col0, row1, col1 = int(row0), int(col0), int(row1), int(col1)
+    n_cols = 2 << level
+    if max_lon - min_lon >= 360.0:
+        cols = range(n_cols)
+    elif col1 >= col0:
+        cols = range(col0, col1 + 1)
+    else:
+        # Wrapped: the east end of the globe, then the west end
+        cols = list(range(col0, n_cols)) + list(range(0, col1 + 1))
+    if max_cells is not None and (row1 - row0 + 1) * len(cols) > max_cells:
+        return None
+    return [int(_pack(level, row, col))
+            for row in range(row0, row1 + 1) for col in cols]
+
+
+def location_key(prefix, lat, lon, level=SPATIAL_INDEX_CONFIG['cache_level']):
+    """Cache/store key for everything about the cell containing a location"""
+    return f"{prefix}_{cell_token(latlon_to_cell(lat, lon, level))}"
+
+
+def main():
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--points', type=int, default=10_000_000)
+    parser.add_argument('--level', type=int, default=14)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    lat = rng.uniform(-90, 90, args.points)
+    lon = rng.uniform(-180, 180, args.points)
+
+    latlon_to_cell(lat[:1000], lon[:1000], args.level)  # Warm up
+    start = time.perf_counter()
+    cells = latlon_to_cell(lat, lon, args.level)
+    elapsed = time.perf_counter() - start
+
+    start = time.perf_counter()
+    cell_to_bounds(cells)
+    bounds_elapsed = time.perf_counter() - start
+
+    print(f"Level {args.level} ({cell_size_deg(args.level):.5f} deg cells), {args.points:,} points")
+    print(f"lat/lon -> cell: {args.points / elapsed / 1e6:.1f} M/s")
+    print(f"cell -> bounds:  {args.points / bounds_elapsed / 1e6:.1f} M/s")
+
+
+if __name__ == "__main__":
+    main()
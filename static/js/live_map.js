@@ -8,18 +8,12 @@ L.tileLayer('https://{s}.basemaps.cartocdn.com/dark_all/{z}/{x}/{y}{r}.png', {
     maxZoom: 19
 }).addTo(map);
 
-// Store fire markers and layers
-let fireMarkers = {
-    landsat: [],
-    viirs: [],
-    modis: []
-};
 let lastUpdate = new Date();
 
-// Custom fire icon based on confidence and satellite
-function getFireIcon(confidence, satellite) {
+// Marker style based on confidence and satellite
+function getFireStyle(confidence, satellite) {
     let size, color;
-    
+
     // Base size on satellite resolution
     switch(satellite) {
         case 'landsat':
@@ -38,96 +32,263 @@ function getFireIcon(confidence, satellite) {
             size = 10;
             color = '#ff4444';
     }
-    
+
     if (confidence === 'low') {
-        color = satellite === 'landsat' ? '#ff8888' : 
-                satellite === 'viirs' ? '#ffcc88' : 
+        color = satellite === 'landsat' ? '#ff8888' :
+                satellite === 'viirs' ? '#ffcc88' :
                 '#ffee88';
     }
-    
-    return L.divIcon({
-        className: 'fire-marker',
-        html: `<div style="
-            width: ${size}px;
-            height: ${size}px;
-            background-color: ${color};
-            border-radius: 50%;
-            box-shadow: 0 0 ${size}px ${color};
-            animation: pulse 1.5s infinite;
-        "></div>`,
-        iconSize: [size, size]
-    });
+
+    return { radius: size / 2, color: color };
 }
 
-// Fetch fire data from NASA FIRMS
-async function fetchFireData() {
-    try {
-        const response = await fetch('/get_fire_data');
-        const data = await response.json();
-        
-        // Clear existing markers
-        Object.values(fireMarkers).forEach(markers => {
-            markers.forEach(marker => marker.remove());
-        });
-        fireMarkers = { landsat: [], viirs: [], modis: [] };
-        
-        // Update statistics
-        updateStats(data);
-        
-        // Add new markers based on satellite type
+// Stable key for a detection so refreshes can be diffed
+function getFireId(fire) {
+    if (fire.id) return fire.id;
+    return [fire.satellite, fire.latitude, fire.longitude, fire.acq_date, fire.acq_time].join(':');
+}
+
+// Single canvas layer holding every detection, keyed by detection ID.
+// Points are drawn directly instead of creating one DOM node per fire, and
+// filters only change which points are painted.
+const FireCanvasLayer = L.Layer.extend({
+    initialize: function() {
+        this._fires = new Map();
+        this._visible = { landsat: true, viirs: true, modis: true, high: true, nominal: true, low: true };
+        this._frame = null;
+    },
+
+    onAdd: function(map) {
+        this._map = map;
+        this._canvas = L.DomUtil.create('canvas', 'fire-canvas-layer leaflet-zoom-hide');
+        this._ctx = this._canvas.getContext('2d');
+        map.getPanes().overlayPane.appendChild(this._canvas);
+        map.on('moveend zoomend resize', this._reset, this);
+        map.on('click', this._onClick, this);
+        this._reset();
+    },
+
+    onRemove: function(map) {
+        L.DomUtil.remove(this._canvas);
+        map.off('moveend zoomend resize', this._reset, this);
+        map.off('click', this._onClick, this);
+    },
+
+    // Apply a full snapshot: only added or removed detections are touched
+    setData: function(data) {
+        const seen = new Set();
+        const added = [];
         data.forEach(fire => {
+            const id = getFireId(fire);
+            seen.add(id);
+            if (!this._fires.has(id)) added.push(fire);
+        });
+        const removed = [];
+        this._fires.forEach((entry, id) => {
+            if (!seen.has(id)) removed.push(id);
+        });
+        this.applyChanges(added, removed);
+    },
+
+    // Apply an incremental update (added detections, removed detection IDs)
+    applyChanges: function(added, removed) {
+        removed.forEach(id => this._fires.delete(id));
+        added.forEach(fire => {
             const satellite = fire.satellite.toLowerCase();
-            const marker = L.marker([fire.latitude, fire.longitude], {
-                icon: getFireIcon(fire.confidence.toLowerCase(), satellite)
+            const confidence = String(fire.confidence).toLowerCase();
+            const style = getFireStyle(confidence, satellite);
+            this._fires.set(getFireId(fire), {
+                fire: fire,
+                latlng: L.latLng(fire.latitude, fire.longitude),
+                satellite: satellite,
+                confidence: confidence,
+                radius: style.radius,
+                color: style.color
             });
-            
-            marker.confidence = fire.confidence.toLowerCase();
-            marker.satellite = satellite;
-            
-            marker.bindPopup(`
+        });
+        if (added.length || removed.length) this.redraw();
+    },
+
+    setFilter: function(key, visible) {
+        this._visible[key] = visible;
+        this.redraw();
+    },
+
+    values: function() {
+        return Array.from(this._fires.values(), entry => entry.fire);
+    },
+
+    redraw: function() {
+        if (!this._map || this._frame) return;
+        this._frame = L.Util.requestAnimFrame(() => {
+            this._frame = null;
+            this._draw();
+        });
+    },
+
+    _isVisible: function(entry) {
+        return this._visible[entry.satellite] !== false && this._visible[entry.confidence] !== false;
+    },
+
+    _reset: function() {
+        const size = this._map.getSize();
+        const topLeft = this._map.containerPointToLayerPoint([0, 0]);
+        L.DomUtil.setPosition(this._canvas, topLeft);
+        this._canvas.width = size.x;
+        this._canvas.height = size.y;
+        this._draw();
+    },
+
+    _draw: function() {
+        const ctx = this._ctx;
+        const size = this._map.getSize();
+        const bounds = this._map.getBounds().pad(0.05);
+        ctx.clearRect(0, 0, size.x, size.y);
+
+        // Group points by colour so each colour is filled in one path
+        const batches = new Map();
+        this._fires.forEach(entry => {
+            if (!this._isVisible(entry) || !bounds.contains(entry.latlng)) return;
+            let batch = batches.get(entry.color);
+            if (!batch) {
+                batch = [];
+                batches.set(entry.color, batch);
+            }
+            const point = this._map.latLngToContainerPoint(entry.latlng);
+            batch.push(point.x, point.y, entry.radius);
+        });
+
+        batches.forEach((points, color) => {
+            ctx.fillStyle = color;
+            // Soft halo in place of the old CSS glow
+            ctx.globalAlpha = 0.3;
+            ctx.beginPath();
+            for (let i = 0; i < points.length; i += 3) {
+                ctx.moveTo(points[i] + points[i + 2] * 2, points[i + 1]);
+                ctx.arc(points[i], points[i + 1], points[i + 2] * 2, 0, Math.PI * 2);
+            }
+            ctx.fill();
+            ctx.globalAlpha = 1;
+            ctx.beginPath();
+            for (let i = 0; i < points.length; i += 3) {
+                ctx.moveTo(points[i] + points[i + 2], points[i + 1]);
+                ctx.arc(points[i], points[i + 1], points[i + 2], 0, Math.PI * 2);
+            }
+            ctx.fill();
+        });
+    },
+
+    _onClick: function(e) {
+        let best = null;
+        let bestDistance = Infinity;
+        this._fires.forEach(entry => {
+            if (!this._isVisible(entry)) return;
+            const point = this._map.latLngToContainerPoint(entry.latlng);
+            const distance = point.distanceTo(e.containerPoint);
+            if (distance <= entry.radius + 3 && distance < bestDistance) {
+                best = entry;
+                bestDistance = distance;
+            }
+        });
+        if (!best) return;
+
+        const fire = best.fire;
+        L.popup()
+            .setLatLng(best.latlng)
+            .setContent(`
                 <div class="fire-popup">
                     <h3>Fire Detection</h3>
                     <p><strong>Satellite:</strong> ${fire.satellite}</p>
                     <p><strong>Confidence:</strong> ${fire.confidence}</p>
                     <p><strong>Detected:</strong> ${new Date(fire.acq_date).toLocaleString()}</p>
-                    <p><strong>Brightness:</strong> ${fire.brightness.toFixed(2)}K</p>
-                    <p><strong>FRP:</strong> ${fire.frp.toFixed(2)} MW</p>
+                    <p><strong>Brightness:</strong> ${Number(fire.brightness).toFixed(2)}K</p>
+                    <p><strong>FRP:</strong> ${Number(fire.frp).toFixed(2)} MW</p>
                 </div>
-            `);
-            
-            if (shouldShowMarker(marker)) {
-                marker.addTo(map);
-            }
-            
-            fireMarkers[satellite].push(marker);
-        });
-        
-        // Update last update time
-        lastUpdate = new Date();
-        document.getElementById('updateTime').textContent = lastUpdate.toLocaleString();
-        
+            `)
+            .openOn(this._map);
+    }
+});
+
+const fireLayer = new FireCanvasLayer().addTo(map);
+
+// Fetch fire data from NASA FIRMS (fallback when streaming is unavailable)
+async function fetchFireData() {
+    try {
+        const response = await fetch('/get_fire_data');
+        const data = await response.json();
+
+        fireLayer.setData(data);
+        onFireDataChanged();
+
     } catch (error) {
         console.error('Error fetching fire data:', error);
     }
 }
 
-// Helper function to determine if a marker should be shown
-function shouldShowMarker(marker) {
-    const confidenceChecked = document.getElementById(marker.confidence + 'Confidence').checked;
-    const satelliteChecked = document.getElementById(marker.satellite + 'Layer').checked;
-    return confidenceChecked && satelliteChecked;
+// Poll for fire data every 10 seconds
+function pollFireData() {
+    fetchFireData();
+    setInterval(fetchFireData, 10 * 1000);
+}
+
+// Subscribe to pushed fire detections: a snapshot on connect, then only
+// added/expired detections. EventSource resumes from the last event ID on
+// reconnect, so the server can replay missed deltas. Falls back to polling
+// if the stream keeps failing or the browser gives up on it.
+const MAX_STREAM_ERRORS = 3;
+
+function streamFireData() {
+    const source = new EventSource('/stream_fire_data');
+    let errors = 0;  // Consecutive failed connection attempts
+
+    // A successful (re)connect clears the count, even if only heartbeats follow
+    source.onopen = () => {
+        errors = 0;
+    };
+
+    source.addEventListener('snapshot', event => {
+        const message = JSON.parse(event.data);
+        fireLayer.setData(message.fires);
+        onFireDataChanged();
+    });
+
+    source.addEventListener('delta', event => {
+        const message = JSON.parse(event.data);
+        fireLayer.applyChanges(message.added, message.removed);
+        onFireDataChanged();
+    });
+
+    source.onerror = () => {
+        errors++;
+        if (source.readyState === EventSource.CLOSED || errors >= MAX_STREAM_ERRORS) {
+            console.error('Fire data stream unavailable, polling instead');
+            source.close();
+            pollFireData();
+        } else {
+            console.error('Fire data stream interrupted, reconnecting...');
+        }
+    };
+}
+
+function onFireDataChanged() {
+    // Update statistics
+    updateStats(fireLayer.values());
+
+    // Update last update time
+    lastUpdate = new Date();
+    document.getElementById('updateTime').textContent = lastUpdate.toLocaleString();
 }
 
 // Update statistics
 function updateStats(data) {
     const totalFires = data.length;
-    const highConfFires = data.filter(fire => fire.confidence.toLowerCase() === 'high').length;
+    const highConfFires = data.filter(fire => String(fire.confidence).toLowerCase() === 'high').length;
     const last24h = data.filter(fire => {
         const fireTime = new Date(fire.acq_date).getTime();
         const dayAgo = Date.now() - (24 * 60 * 60 * 1000);
         return fireTime > dayAgo;
     }).length;
-    
+
     document.getElementById('totalFires').textContent = totalFires;
     document.getElementById('highConfFires').textContent = highConfFires;
     document.getElementById('last24h').textContent = last24h;
@@ -135,26 +296,75 @@ function updateStats(data) {
 
 // Filter handlers for confidence levels
 ['high', 'nominal', 'low'].forEach(confidence => {
-    document.getElementById(confidence + 'Confidence').addEventListener('change', function() {
-        Object.values(fireMarkers).flat().forEach(marker => {
-            if (marker.confidence === confidence) {
-                if (shouldShowMarker(marker)) marker.addTo(map);
-                else marker.remove();
-            }
-        });
+    const checkbox = document.getElementById(confidence + 'Confidence');
+    fireLayer.setFilter(confidence, checkbox.checked);
+    checkbox.addEventListener('change', function() {
+        fireLayer.setFilter(confidence, this.checked);
     });
 });
 
 // Filter handlers for satellite layers
 ['landsat', 'viirs', 'modis'].forEach(satellite => {
-    document.getElementById(satellite + 'Layer').addEventListener('change', function() {
-        fireMarkers[satellite].forEach(marker => {
-            if (shouldShowMarker(marker)) marker.addTo(map);
-            else marker.remove();
-        });
+    const checkbox = document.getElementById(satellite + 'Layer');
+    fireLayer.setFilter(satellite, checkbox.checked);
+    checkbox.addEventListener('change', function() {
+        fireLayer.setFilter(satellite, this.checked);
     });
 });
 
-// Fetch data initially and update frequently
-fetchFireData();
-setInterval(fetchFireData, 10 * 1000); // Update every 10 seconds
+// Frame-time measurement for the fire layer.
+// Run `benchmarkFireLayer()` from the browser console; it draws `count`
+// synthetic detections over India and reports per-frame draw times.
+function benchmarkFireLayer(count = 10000, frames = 30) {
+    const satellites = ['landsat', 'viirs', 'modis'];
+    const confidences = ['high', 'nominal', 'low'];
+    const synthetic = [];
+    for (let i = 0; i < count; i++) {
+        synthetic.push({
+            id: 'bench:' + i,
+            latitude: 8 + Math.random() * 28,
+            longitude: 69 + Math.random() * 28,
+            satellite: satellites[i % 3],
+            confidence: confidences[i % 3],
+            acq_date: new Date().toISOString(),
+            brightness: 330,
+            frp: 10
+        });
+    }
+
+    const liveData = fireLayer.values();
+    let start = performance.now();
+    fireLayer.setData(synthetic);
+    const diffTime = performance.now() - start;
+
+    const times = [];
+    for (let i = 0; i < frames; i++) {
+        start = performance.now();
+        fireLayer._draw();
+        times.push(performance.now() - start);
+    }
+    times.sort((a, b) => a - b);
+
+    start = performance.now();
+    fireLayer.setData(synthetic.slice(0, count - 100));
+    const incrementalTime = performance.now() - start;
+
+    const result = {
+        detections: count,
+        diffMs: diffTime,
+        incrementalDiffMs: incrementalTime,
+        medianFrameMs: times[Math.floor(times.length / 2)],
+        maxFrameMs: times[times.length - 1]
+    };
+    console.table(result);
+    fireLayer.setData(liveData);  // Restore live data
+    return result;
+}
+window.benchmarkFireLayer = benchmarkFireLayer;
+
+// Stream updates when supported, otherwise poll
+if (window.EventSource) {
+    streamFireData();
+} else {
+    pollFireData();
+}
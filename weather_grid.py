@@ -0,0 +1,294 @@
+"""
+Forest Fire Prediction - Gridded weather ingestion and nationwide scoring
+
+Scores fire risk for every cell of a regular lat/lon grid (all of India at
+0.05 degrees by default) from gridded weather files instead of one
+OpenWeather call per point. Files dropped in the drop directory are read
+in chunks and written into memory-mapped float32 arrays, one per variable.
+Those arrays are then scored block by block with the vectorized FWI code
+and temp_model. Peak memory depends on the chunk sizes, not the grid.
+
+Inputs:
+    *.csv          columns lat, lon, temperature (C), humidity (%), wind_speed (m/s), rain (mm)
+    *.nc, *.grib   read with xarray (plus cfgrib for GRIB) if installed; variables are
+                   matched by the names in GRID_CONFIG['variables'] and converted by
+                   their units attribute; one time step is used (--time-index)
+
+Outputs (in the output directory): temperature/humidity/wind_speed/rain/ffmc/fwi/
+probability .npy arrays of shape (rows, cols), row 0 at the southern edge,
+and grid.json with the grid definition and run report.
+
+Usage:
+    python weather_grid.py [--drop-dir data/weather_grids] [--resolution 0.05]
+    python weather_grid.py --synthetic      # Write a synthetic CSV to the drop dir first
+"""
+import argparse
+import glob
+import json
+import os
+import resource
+import time
+from datetime import datetime
+
+import joblib
+import numpy as np
+import pandas as pd
+
+import fwi
+from config import GRID_CONFIG
+
+VARIABLES = ('temperature', 'humidity', 'wind_speed', 'rain')
+
+# (scale, offset) from a NetCDF/GRIB units attribute to the CSV units;
+# precipitation rates become daily totals, like the FWI's 24-hour rain
+UNITS = {
+    'temperature': {'K': (1.0, -273.15), 'kelvin': (1.0, -273.15),
+                    'C': (1.0, 0.0), 'degC': (1.0, 0.0), 'celsius': (1.0, 0.0)},
+    'humidity': {'%': (1.0, 0.0), 'percent': (1.0, 0.0), '1': (100.0, 0.0), 'fraction': (100.0, 0.0)},
+    'wind_speed': {'m s-1': (1.0, 0.0), 'm/s': (1.0, 0.0), 'km h-1': (1 / 3.6, 0.0),
+                   'km/h': (1 / 3.6, 0.0), 'knots': (0.514444, 0.0), 'kt': (0.514444, 0.0)},
+    'rain': {'mm': (1.0, 0.0), 'kg m-2': (1.0, 0.0), 'm': (1000.0, 0.0),
+             'mm h-1': (24.0, 0.0), 'mm/h': (24.0, 0.0), 'mm day-1': (1.0, 0.0), 'mm/day': (1.0, 0.0),
+             'kg m-2 s-1': (86400.0, 0.0), 'm s-1': (86400000.0, 0.0)}
+}
+TIME_DIMS = ('time', 'valid_time', 'step')
+
+
+class Grid:
+    """Regular lat/lon grid over a bounding box; cell (row, col) is indexed from the south-west corner"""
+
+    def __init__(self, bbox=GRID_CONFIG['bbox'], resolution=GRID_CONFIG['resolution']):
+        self.min_lat, self.min_lon, self.max_lat, self.max_lon = bbox
+        self.resolution = resolution
+        self.rows = int(round((self.max_lat - self.min_lat) / resolution))
+        self.cols = int(round((self.max_lon - self.min_lon) / resolution))
+
+    @property
+    def shape(self):
+        return self.rows, self.cols
+
+    def latitudes(self):
+        return self.min_lat + (np.arange(self.rows) + 0.5) * self.resolution
+
+    def longitudes(self):
+        return self.min_lon + (np.arange(self.cols) + 0.5) * self.resolution
+
+    def index(self, lat, lon):
+        """(rows, cols, inside) for arrays of coordinates"""
+        rows = np.floor((np.asarray(lat) - self.min_lat) / self.resolution).astype(np.int64)
+        cols = np.floor((np.asarray(lon) - self.min_lon) / self.resolution).astype(np.int64)
+        inside = (rows >= 0) & (rows < self.rows) & (cols >= 0) & (cols < self.cols)
+        return rows, cols, inside
+
+    def describe(self):
+        return {'bbox': [self.min_lat, self.min_lon, self.max_lat, self.max_lon],
+                'resolution': self.resolution, 'shape': list(self.shape)}
+
+
+def open_arrays(directory, grid, names, mode='w+'):
+    """Memory-mapped float32 arrays on the grid, NaN-filled when created"""
+    os.makedirs(directory, exist_ok=True)
+    arrays = {}
+    for name in names:
+        path = os.path.join(directory, f"{name}.npy")
+        if mode == 'w+':
+            arrays[name] = np.lib.format.open_memmap(path, mode='w+', dtype=np.float32, shape=grid.shape)
+            arrays[name][:] = np.nan
+        else:
+            arrays[name] = np.load(path, mmap_mode=mode)
+    return arrays
+
+
+def ingest_csv(path, grid, arrays, chunk_size=GRID_CONFIG['csv_chunk_size']):
+    """Scatter a CSV grid into the arrays chunk by chunk; returns the number of cells written"""
+    written = 0
+    for chunk in pd.read_csv(path, chunksize=chunk_size):
+        rows, cols, inside = grid.index(chunk['lat'].values, chunk['lon'].values)
+        rows, cols = rows[inside], cols[inside]
+        for name in VARIABLES:
+            arrays[name][rows, cols] = chunk[name].values[inside]
+        written += int(inside.sum())
+    return written
+
+
+def unit_conversion(name, units):
+    """(scale, offset) converting a variable from its units attribute; raises ValueError if unknown"""
+    if units is None:
+        raise ValueError(f"{name} has no units attribute")
+    # CF (m s-1), GRIB (m s**-1) and caret (m s^-1) spellings
+    key = ' '.join(str(units).replace('**', '').replace('^', '').split())
+    try:
+        return UNITS[name][key]
+    except KeyError:
+        raise ValueError(f"Unsupported units {units!r} for {name}") from None
+
+
+def select_time(variable, time_index):
+    """The 2-D (lat, lon) field at one time step; raises ValueError for other extra dimensions"""
+    for dim in TIME_DIMS:
+        if dim in variable.dims:
+            variable = variable.isel({dim: time_index})
+    variable = variable.squeeze(drop=True)
+    if variable.ndim != 2:
+        raise ValueError(f"{variable.name} has dimensions {variable.dims}, expected latitude and longitude")
+    return variable
+
+
+def ingest_dataset(path, grid, arrays, chunk_rows=GRID_CONFIG['chunk_rows'],
+                   time_index=GRID_CONFIG['time_index']):
+    """
+    Sample one time step of a NetCDF/GRIB file onto the grid (nearest source
+    cell), a band of rows at a time
+    """
+    import xarray as xr  # Only needed for NetCDF/GRIB drops
+
+    engine = 'cfgrib' if path.endswith(('.grib', '.grib2')) else None
+    with xr.open_dataset(path, engine=engine) as dataset:
+        lat_name = next(name for name in ('latitude', 'lat') if name in dataset.coords)
+        lon_name = next(name for name in ('longitude', 'lon') if name in dataset.coords)
+        sources = {}
+        for name in VARIABLES:
+            source = next((var for var in GRID_CONFIG['variables'][name] if var in dataset), None)
+            if source is None:
+                raise ValueError(f"{path} has no variable for {name}")
+            variable = select_time(dataset[source], time_index)
+            sources[name] = variable, unit_conversion(name, variable.attrs.get('units'))
+
+        lons = grid.longitudes()
+        for start in range(0, grid.rows, chunk_rows):
+            lats = grid.latitudes()[start:start + chunk_rows]
+            for name, (variable, (scale, offset)) in sources.items():
+                values = variable.sel({lat_name: lats, lon_name: lons}, method='nearest').values
+                arrays[name][start:start + len(lats)] = values * scale + offset
+    return grid.rows * grid.cols
+
+
+def ingest(drop_dir, grid, output_dir, time_index=GRID_CONFIG['time_index']):
+    """Load every file in the drop directory into the weather arrays (later files win)"""
+    arrays = open_arrays(output_dir, grid, VARIABLES)
+    files = sorted(path for pattern in ('*.csv', '*.nc', '*.grib', '*.grib2')
+                   for path in glob.glob(os.path.join(drop_dir, pattern)))
+    if not files:
+        raise FileNotFoundError(f"No weather grids in {drop_dir}")
+
+    cells = 0
+    for path in files:
+        if path.endswith('.csv'):
+            cells += ingest_csv(path, grid, arrays)
+        else:
+            cells += ingest_dataset(path, grid, arrays, time_index=time_index)
+    for array in arrays.values():
+        array.flush()
+    return files, cells
+
+
+def score(grid, output_dir, model, when, chunk_rows=GRID_CONFIG['chunk_rows']):
+    """Compute FFMC, FWI and fire probability for every cell with complete weather"""
+    weather = open_arrays(output_dir, grid, VARIABLES, mode='r')
+    results = open_arrays(output_dir, grid, ('ffmc', 'fwi', 'probability'))
+    scored = 0
+
+    for start in range(0, grid.rows, chunk_rows):
+        block = slice(start, start + chunk_rows)
+        values = {name: np.asarray(weather[name][block], dtype=float).ravel() for name in VARIABLES}
+        valid = np.all([np.isfinite(values[name]) for name in VARIABLES], axis=0)
+        if not valid.any():
+            continue
+
+        temp = values['temperature'][valid] + 273.15
+        humidity = np.clip(values['humidity'][valid], 0, 100)
+        wind = np.fmax(values['wind_speed'][valid], 0)
+        rain = np.fmax(values['rain'][valid], 0)
+
+        indices = fwi.fire_weather_indices(temp, humidity, wind, rain)
+        features = fwi.temp_model_frame(when.day, when.month, when.year,
+                                        temp, humidity, wind, rain, indices)
+        probability = model.predict_proba(features)[:, 1]
+
+        shape = results['probability'][block].shape
+        for name, value in (('ffmc', indices['FFMC']), ('fwi', indices['FWI']),
+                            ('probability', probability)):
+            out = np.full(valid.shape, np.nan, dtype=np.float32)
+            out[valid] = value
+            results[name][block] = out.reshape(shape)
+        scored += int(valid.sum())
+
+    for array in results.values():
+        array.flush()
+    return scored
+
+
+def write_synthetic_csv(path, grid, seed=0):
+    """A plausible-looking CSV weather grid covering `grid`, written in row bands"""
+    rng = np.random.default_rng(seed)
+    lons = grid.longitudes()
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path, 'w') as f:
+        f.write('lat,lon,temperature,humidity,wind_speed,rain\n')
+        for start in range(0, grid.rows, GRID_CONFIG['chunk_rows']):
+            lat = np.repeat(grid.latitudes()[start:start + GRID_CONFIG['chunk_rows']], len(lons))
+            lon = np.tile(lons, len(lat) // len(lons))
+            band = pd.DataFrame({
+                'lat': lat.round(4),
+                'lon': lon.round(4),
+                'temperature': (38 - 0.5 * (lat - grid.min_lat) + rng.normal(0, 2, len(lat))).round(2),
+                'humidity': np.clip(rng.normal(45, 15, len(lat)), 5, 100).round(1),
+                'wind_speed': np.fmax(rng.normal(4, 2, len(lat)), 0).round(2),
+                'rain': np.where(rng.random(len(lat)) < 0.1, rng.exponential(3, len(lat)), 0).round(2)
+            })
+            band.to_csv(f, header=False, index=False)
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--drop-dir', default=GRID_CONFIG['drop_dir'])
+    parser.add_argument('--output-dir', default=GRID_CONFIG['output_dir'])
+    parser.add_argument('--resolution', type=float, default=GRID_CONFIG['resolution'])
+    parser.add_argument('--date', help="Date for the model's day/month/year features (YYYY-MM-DD)")
+    parser.add_argument('--time-index', type=int, default=GRID_CONFIG['time_index'],
+                        help="Time step of NetCDF/GRIB files to score (default: last)")
+    parser.add_argument('--synthetic', action='store_true')
+    args = parser.parse_args()
+
+    grid = Grid(resolution=args.resolution)
+    when = datetime.strptime(args.date, '%Y-%m-%d') if args.date else datetime.now()
+    if args.synthetic:
+        write_synthetic_csv(os.path.join(args.drop_dir, 'synthetic.csv'), grid)
+
+    model = joblib.load('models/temp.joblib')
+    start = time.perf_counter()
+    files, cells = ingest(args.drop_dir, grid, args.output_dir, args.time_index)
+    ingest_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    scored = score(grid, args.output_dir, model, when)
+    score_seconds = time.perf_counter() - start
+    peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+    probability = np.load(os.path.join(args.output_dir, 'probability.npy'), mmap_mode='r')
+    levels, counts = np.unique(fwi.risk_levels(probability[np.isfinite(probability)]), return_counts=True)
+    report = {
+        'grid': grid.describe(),
+        'files': files,
+        'cells_ingested': cells,
+        'cells_scored': scored,
+        'date': when.strftime('%Y-%m-%d'),
+        'ingest_seconds': round(ingest_seconds, 2),
+        'score_seconds': round(score_seconds, 2),
+        'peak_rss_mb': round(peak_mb),
+        'risk_levels': {str(level): int(count) for level, count in zip(levels, counts)}
+    }
+    with open(os.path.join(args.output_dir, 'grid.json'), 'w') as f:
+        json.dump(report, f, indent=2)
+
+    print(f"Grid {grid.rows}x{grid.cols} at {grid.resolution} deg, {len(files)} file(s)")
+    print(f"Ingest: {cells:,} cells in {ingest_seconds:.2f}s")
+    print(f"Score:  {scored:,} cells in {score_seconds:.2f}s")
+    print(f"Peak RSS: {peak_mb:.0f} MB")
+    for level, count in report['risk_levels'].items():
+        print(f"  {level}: {count:,}")
+
+
+if __name__ == "__main__":
+    main()